@@ -416,8 +416,7 @@ class App:
 
             if self.is_recording:
               timestamp = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-              with open(self.recording_file.name, "a") as rec_file:
-                 rec_file.write(f"{timestamp} - {formatted_data}\n")
+              self.recording_file.write(f"{timestamp} - {formatted_data}\n")
 
             self.update_gui_values()
 
@@ -440,7 +439,7 @@ class App:
             self.is_recording = True
             try:
                 filename = f"recorded_data_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                self.recording_file = open(filename, "w")
+                self.recording_file = open(filename, "w", buffering=1 << 16)
                 self.record_button.config(text="Остановить")
             except Exception as e:
                 print(f"Ошибка при создании файла: {e}")
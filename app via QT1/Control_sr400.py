@@ -1,8 +1,13 @@
 import pyvisa
+import os
 import time
 import numpy as np
 import sys
 
+# разбор дампа и симулятор лежат рядом с main8.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app via lib"))
+from sr400_device import parse_dump
+
 pyvisa.log_to_screen = True
 
 
@@ -11,13 +16,28 @@ class Sr400(object):
     numOfPeriods = 1
     t_set = None
     dwel_time = None
+    chunk_size = 4096  # байт за одно чтение при выгрузке буфера
+    max_line_bytes = 24  # верхняя оценка длины одной строки буфера
+    poll_min = 0.005  # с, минимальный интервал опроса NN
+    poll_max = 0.1  # с, максимальный интервал опроса NN (и проверки флага остановки)
+    last_batch = None  # (команд, записей, секунд) последней пакетной отправки
+    live_periods = 2000  # NP в живом режиме (максимум SR400), после него счёт перезапускается
+    live_skipped = 0  # периодов, пропущенных живым режимом (опрос не успел)
+    stop_requested = False
 
-    def __init__(self, n_counts, t_set, dwel_time):
-        """:param n_counts - количество усреднения, t_set - время накопления"""
+    def __init__(self, n_counts, t_set, dwel_time, resource='ASRL5::INSTR'):
+        """:param n_counts - количество усреднения, t_set - время накопления,
+        resource - ресурс VISA или "sim[:RATE_A[:RATE_B]]" для работы без прибора"""
         try:
-            self.rm = pyvisa.ResourceManager()  # "@ni"
-            print("ok")
-            self.sr4 = self.rm.open_resource('ASRL5::INSTR')
+            if resource == "sim" or resource.startswith("sim:"):
+                from sr400_sim import open_simulator
+                self.rm = None
+                self.sr4 = open_simulator(resource)
+            else:
+                self.rm = pyvisa.ResourceManager()  # "@ni"
+                print("ok")
+                self.sr4 = self.rm.open_resource(resource)
+            self.state = {}  # последние записанные настройки, копия состояния прибора
             time.sleep(0.1)
             Cur_Num_ofPeriods = self.sr4.query("NN")  # ругается когда добавляю '\n'
             print(Cur_Num_ofPeriods, "Cur_Num_ofPeriods")
@@ -25,8 +45,8 @@ class Sr400(object):
             self.t_set = t_set
             self.dwel_time = dwel_time
             print("Read current PORT")
-            self.write_com(f"CP 2 {self.t_set * 10 ** 7}")
-            self.write_com(f"NP {self.numOfPeriods}")
+            self.set_param("CP2", f"CP2,{int(self.t_set * 10 ** 7)}")
+            self.set_param("NP", f"NP {self.numOfPeriods}")
 
         except ValueError as error:
             print("порт не открылся")
@@ -34,30 +54,161 @@ class Sr400(object):
     def write_com(self, command):
         self.sr4.write(f"{command.rstrip()}\n")
 
+    def write_batch(self, commands):
+        """Несколько команд одной строкой через ';' - одна запись вместо нескольких."""
+        if commands:
+            self.write_com(";".join(commands))
+
+    def query_many(self, commands):
+        """Несколько запросов одной строкой, ответы читаются подряд без пауз."""
+        self.write_com(";".join(commands))
+        return [self.sr4.read().strip() for _ in commands]
+
+    def set_param(self, key, command):
+        """Пишет настройку только если она отличается от сохранённой. True - команда отправлена."""
+        if self.state.get(key) == command:
+            return False
+        self.write_com(command)
+        self.state[key] = command
+        return True
+
+    def invalidate_state(self):
+        """Сброс кэша настроек (после CL или переподключения)."""
+        self.state = {}
+
+    def reset(self):
+        self.write_com("CL")
+        self.invalidate_state()
+
     def numperiod(self, n_counts):
         self.numOfPeriods = n_counts
-        self.write_com(f"NP {self.numOfPeriods}")
+        self.set_param("NP", f"NP {self.numOfPeriods}")
 
     def tset(self, t_set):
         self.t_set = t_set
-        self.write_com(f"CP2,{self.t_set * 10 ** 7}")
+        self.set_param("CP2", f"CP2,{int(self.t_set * 10 ** 7)}")
 
     def start_count(self):
+        """CR, изменившиеся настройки и CS одной записью."""
+        commands = ["CR"]
+        for key, command in (("CP2", f"CP2,{int(self.t_set * 10 ** 7)}"), ("NP", f"NP {self.numOfPeriods}")):
+            if self.state.get(key) != command:
+                commands.append(command)
+                self.state[key] = command
+        commands.append("CS")
+        started = time.perf_counter()
+        self.write_batch(commands)
+        self.last_batch = (len(commands), 1, time.perf_counter() - started)
+
+    def periods_done(self):
+        """Сколько периодов уже отсчитано (NN), None если запрос не прошёл."""
+        try:
+            return int(float(self.sr4.query("NN").strip()))
+        except Exception as e:
+            print(e)
+            return None
+
+    def wait_for_completion(self, timeout, is_running=lambda: True):
+        """Опрос NN с нарастающим интервалом вместо фиксированного sleep. True - счёт закончен."""
+        deadline = time.time() + timeout
+        interval = self.poll_min
+        last_done = -1
+        while is_running() and time.time() < deadline:
+            done = self.periods_done()
+            if done is not None and done >= self.numOfPeriods:
+                return True
+            if done is not None and done > last_done:
+                last_done = done
+                interval = (self.numOfPeriods - done) * self.t_set
+            else:
+                interval *= 2
+            time.sleep(min(max(interval, self.poll_min), self.poll_max, max(deadline - time.time(), 0)))
+        return False
+
+    def acquire_data(self):
+        """Один прогон: старт, ожидание конца счёта, выгрузка A и B. Строки [a, b] по периодам."""
+        self.stop_requested = False
+        self.start_count()
+        timeout = (self.t_set + (self.dwel_time or 0)) * self.numOfPeriods + 1.1
+        if not self.wait_for_completion(timeout, lambda: not self.stop_requested) and self.stop_requested:
+            return None
+        fa = self.single_read('A')
+        fb = self.single_read('B')
+        n = min(len(fa), len(fb))
+        return np.column_stack((fa[:n, 0], fb[:n, 0]))
+
+    def live_counts(self, is_running=lambda: True):
+        """Живой режим: NP и один старт, затем по каждому новому периоду (done, A, B).
+
+        NN, QA и QB уходят одной строкой, так что A и B берутся из одного и
+        того же последнего законченного периода. Опрос идёт к ожидаемому
+        концу следующего периода, а не через фиксированные паузы. Длина
+        периода берётся из самих ответов NN (время с CS / NN), а не из
+        dwel_time: DT прибору не отправляется, его dwell может отличаться. Если за
+        время опроса закончилось больше одного периода, в live_skipped
+        считаются пропущенные. После live_periods периодов счёт
+        перезапускается одной записью CR;CS.
+        """
+        self.live_skipped = 0
+        n_counts = self.numOfPeriods  # NP живого режима только на время сессии
+        self.numOfPeriods = self.live_periods
+        period = self.t_set  # до первого ответа: не длиннее настоящего периода, опрос скорее рано, чем поздно
+        try:
+            while is_running():
+                self.start_count()
+                run_start = time.perf_counter()
+                last = 0
+                while is_running() and last < self.live_periods:
+                    next_end = run_start + (last + 1) * period
+                    time.sleep(max(next_end - time.perf_counter(), self.poll_min))
+                    polled = time.perf_counter()
+                    try:
+                        done, count_a, count_b = self.query_many(["NN", "QA", "QB"])
+                        done = int(float(done))
+                    except Exception as e:
+                        print(e)
+                        continue
+                    if done <= last:
+                        continue
+                    period = (polled - run_start) / done  # done периодов закончились до опроса
+                    self.live_skipped += done - last - 1
+                    last = done
+                    yield done, int(float(count_a)), int(float(count_b))
+        finally:
+            self.numOfPeriods = n_counts  # следующий start_count снова отправит NP N
+            self.write_com("CR")
+
+    def stop_acquisition(self):
+        self.stop_requested = True
         self.write_com("CR")
-        time.sleep(0.1)
-        self.write_com(f"CP2,{int(self.t_set * 10 ** 7)}")
-        time.sleep(0.1)
-        self.write_com(f"NP {self.numOfPeriods}")
-        time.sleep(0.1)
-        self.write_com("CS")
 
     def single_read(self, chanel='A'):
-        f = []
+        """Выгрузка буфера канала одним потоком байт, разбор сразу в массив numpy (parse_dump из sr400_device)."""
         self.sr4.write(f"E{chanel}")
-        for iter_i in range(self.numOfPeriods):
-            f.append(list(map(int, self.sr4.read().rstrip().split(','))))
-        return f
+        expected = self.numOfPeriods * self.max_line_bytes
+        buf = bytearray()
+        lines = 0
+        while lines < self.numOfPeriods and len(buf) < expected:
+            try:
+                pending = self.sr4.bytes_in_buffer
+            except AttributeError:
+                pending = None  # GPIB-ресурс pyvisa: bytes_in_buffer нет, читаем построчно
+            if pending is None:
+                try:
+                    chunk = (self.sr4.read().rstrip("\r\n") + "\n").encode("ascii")
+                except Exception as e:
+                    print(e)
+                    break
+            else:
+                size = max(1, min(pending, self.chunk_size, expected - len(buf)))
+                chunk = self.sr4.read_bytes(size, break_on_termchar=False)
+            if not chunk:
+                break
+            buf += chunk
+            lines += chunk.count(b"\n")
+        return parse_dump(bytes(buf), self.numOfPeriods)  # битые строки отбрасываются целиком
 
     def close(self):
         self.sr4.close()
-        self.rm.close()
+        if self.rm is not None:
+            self.rm.close()
@@ -1,11 +1,16 @@
 import sys
-import time
 import csv
 import datetime
 
+import os
 import numpy as np
 from Control_sr400 import Sr400
 
+# общий движок сбора данных лежит рядом с main8.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app via lib"))
+from acquisition_engine import AcquisitionEngine
+from decimate import DecimatedSeries
+
 import re
 
 from PySide6 import QtWidgets, QtCore, QtUiTools
@@ -27,31 +32,17 @@ class WorkerLive(QtCore.QObject):
         self.dwell_time = dwel_time
 
     def run(self):
-        # Запуск счетчика
-        # self.control_sr400.start_count()
-
-        # Вместо одного большого time.sleep() делим время на короткие интервалы
+        # Один запуск на live_periods периодов вместо CR + FA/FB на каждую точку:
+        # A и B из одного периода, точка на каждый период счётчика
         self.control_sr400.tset(self.t_set)
-        time.sleep(0.01)
-        self.control_sr400.write_com("NP 1")
-        time.sleep(self.t_set + 0.1)
         print("start")
-        while self._is_running:
-            try:
-                self.control_sr400.write_com("CR")
-                Fa = self.control_sr400.sr4.query("FA")
-                time.sleep(self.t_set + 0.01)
-                Fa = list(map(int, Fa.rstrip().split(',')))
-
-                self.control_sr400.write_com("CR")
-                Fb = self.control_sr400.sr4.query("FB")
-                time.sleep(self.t_set + self.dwell_time + 0.01)
-                Fb = list(map(int, Fb.rstrip().split(',')))
-                
-                self.progress.emit((Fa, Fb))
-            except Exception as e:
-                print(e)
-                break
+        try:
+            for done, count_a, count_b in self.control_sr400.live_counts(lambda: self._is_running):
+                self.progress.emit(([count_a], [count_b]))
+        except Exception as e:
+            print(e)
+        if self.control_sr400.live_skipped:
+            print("Пропущено периодов:", self.control_sr400.live_skipped)
         self.finished.emit(None)
 
     def stop(self):
@@ -72,37 +63,31 @@ class Worker(QtCore.QObject):
         self.N_count = N_count
         self._is_running = True  # Флаг для остановки
         self.dwell_time = dwel_time
+        self.engine = None
 
     def run(self):
-        # Запуск счетчика
-        self.control_sr400.start_count()
-
-        # Вместо одного большого time.sleep() делим время на короткие интервалы
-        total_sleep = self.t_set * self.N_count + self.dwell_time * self.N_count + 0.1  # + self.dwell_time * self.N_count
-        interval = 1e-1  # интервал проверки флага остановки
-        elapsed = 0.0
-        while self._is_running and elapsed < total_sleep:
-            time.sleep(min(interval, total_sleep - elapsed))
-            elapsed += interval
-            # Здесь можно посылать сигналы с прогрессом, если требуется
+        # Один эксперимент через общий движок (acquisition_engine.py): старт, опрос NN, выгрузка A и B
+        self.engine = AcquisitionEngine(self.control_sr400, 1, streaming=False, pause=0)
+        results = []
+        self.engine.subscribe(lambda event: results.append(event["data"]) if event["kind"] == "experiment" else None)
         print("чтение")
-        # Если операция не была остановлена извне, читаем данные
-        if self._is_running:
-            try:
-                Fa = self.control_sr400.single_read('A')
-                Fb = self.control_sr400.single_read('B')
-                # self.progress.emit(Fa)  # отправляем результат через сигнал
-                self.progress.emit(Fa)
-                self.finished.emit((Fa, Fb))
-            except:
-                self.finished.emit(None)
+        self.engine.run()
+        if self._is_running and results:
+            data = results[0]
+            Fa = data[:, :1]
+            Fb = data[:, 1:2]
+            self.progress.emit(Fa)
+            self.finished.emit((Fa, Fb))
         else:
             self.finished.emit(None)
 
     def stop(self):
         self._is_running = False
-        # Дополнительно можно отправить команду на прерывание в устройстве:
-        self.control_sr400.write_com("CR")
+        # Движок сам отправит CR (stop_acquisition)
+        if self.engine:
+            self.engine.stop()
+        else:
+            self.control_sr400.write_com("CR")
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -111,6 +96,7 @@ class MainWindow(QtWidgets.QMainWindow):
     N_count = 1
     t_set = 10e-3
     dwel_time = 8e-3
+    resource = 'ASRL5::INSTR'  # "sim" - симулятор вместо прибора
 
     def __init__(self):
         super().__init__()
@@ -160,9 +146,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ax.legend()
 
         # Инициализируем данные для графика
+        # Ряды хранят пирамиду min/max: на график уходит ~одна точка на пиксель, а не весь ряд
         self.xdata = []
-        self.ydata = []
-        self.ydata2 = []  # для канала B
+        self.ydata = DecimatedSeries()
+        self.ydata2 = DecimatedSeries()  # для канала B
+        self.plotted_points = 0  # сколько точек было в рядах при последней перерисовке
         self.counter = 0
 
         # Настраиваем таймер для обновления графика каждые 1000 мс (1 секунда)
@@ -199,7 +187,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.accumulate_time_line.editingFinished.connect(self.accumulate_time_set)
         self.dwel_time_line.editingFinished.connect(self.dwel_time_set)
 
-        self.control_sr400 = Sr400(n_counts=self.N_count, t_set=self.t_set, dwel_time=self.dwel_time)
+        self.control_sr400 = Sr400(n_counts=self.N_count, t_set=self.t_set, dwel_time=self.dwel_time,
+                                   resource=self.resource)
 
 
     def accumulate_time_set(self):
@@ -209,6 +198,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def dwel_time_set(self):
         self.dwel_time = self.extract_number(self.dwel_time_line.text())
+        self.control_sr400.dwel_time = self.dwel_time
         print("Редактирование завершено. Текущий текст:", self.dwel_time)
 
     def filewrite(self, state):
@@ -256,11 +246,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
             self.worker_thread.start()
 
-            self.ydata = []
-            self.ydata2 = []
+            self.ydata.clear()
+            self.ydata2.clear()
         else:
-            self.ydata = []
-            self.ydata2 = []
+            self.ydata.clear()
+            self.ydata2.clear()
             if self.worker_thread is not None:
                 if self.worker_thread.isRunning():
                     print("Задача уже запущена!")
@@ -281,8 +271,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
             self.worker_thread.start()
 
-            self.ydata = []
-            self.ydata2 = []
+            self.ydata.clear()
+            self.ydata2.clear()
 
     def handle_progress_live(self, data):
         # Этот метод вызывается из рабочего потока через сигнал.
@@ -291,7 +281,7 @@ class MainWindow(QtWidgets.QMainWindow):
             dataA, dataB = data
             self.ydata.append(dataA[0])
             self.ydata2.append(dataB[0])
-            print("Прогресс/результат:", self.ydata, len(self.ydata))
+            print("Прогресс/результат:", dataA[0], dataB[0], len(self.ydata))
         else:
             print("Работа остановлена до завершения измерения.")
         # Обнуляем ссылки, чтобы поток и объект worker могли быть удалены сборщиком мусора
@@ -317,8 +307,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
             self.ydata.extend(dataA)
             self.ydata2.extend(dataB)
-            self.xdata = list(range(1, len(self.ydata) + 1))
-            print("Прогресс/результат:", self.ydata, len(self.ydata))
+            self.xdata = self.ydata.x
+            print("Прогресс/результат:", avrA, avrB, len(self.ydata))
             if self.file_write:
                 # Получаем текущее время
                 current_time = datetime.datetime.now()
@@ -329,8 +319,7 @@ class MainWindow(QtWidgets.QMainWindow):
                     # Записываем заголовок (опционально)
                     writer.writerow(["N", "Counts"])
                     # Записываем данные
-                    for xi, yi in zip(self.xdata, self.ydata):
-                        writer.writerow([xi, yi])
+                    writer.writerows(zip(self.xdata.astype(int).tolist(), self.ydata.values.tolist()))
         else:
             print("Работа остановлена до завершения измерения.")
         # Обнуляем ссылки, чтобы поток и объект worker могли быть удалены сборщиком мусора
@@ -382,14 +371,15 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def update_plot(self):
         """Метод обновления графика."""
-        # Добавляем новую точку (например, значение синуса)
-        # array = list(range(1, n + 1))
-        self.xdata = list(range(1, len(self.ydata) + 1))
-        # self.ydata
+        # Новых точек нет - перерисовывать нечего
+        if len(self.ydata) == self.plotted_points and len(self.ydata2) == self.plotted_points:
+            return
+        self.plotted_points = len(self.ydata)
 
-        # Обновляем данные линии
-        self.line.set_data(self.xdata, self.ydata)
-        self.line2.set_data(self.xdata, self.ydata2)
+        # Обновляем данные линий прореженными рядами (ширина оси в пикселях)
+        pixels = self.ax.bbox.width
+        self.line.set_data(*self.ydata.view(pixels=pixels))
+        self.line2.set_data(*self.ydata2.view(pixels=pixels))
 
         # Подгоняем границы осей под новые данные
         self.ax.relim()
@@ -422,6 +412,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        MainWindow.resource = sys.argv[1]
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,259 @@
+#acquisition_engine.py
+import argparse
+import os
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+from online_stats import StreamStats
+
+
+class AcquisitionEngine:
+    """Runs M experiments on a counter driver in a background thread, without any GUI.
+
+    The driver needs acquire_data() returning one row per period, and may
+    offer stream_data() yielding chunks of rows while it counts (used when
+    streaming=True). Front ends subscribe a callback and get events as
+    dicts with a "kind" key:
+      "start"      - experiment is about to start ("experiment")
+      "chunk"      - rows that just arrived ("experiment", "data")
+      "experiment" - experiment done ("experiment", "data", "avg_a", "avg_b", "rel_error",
+                     "boundaries": [(period, dead time s)] where runs were stitched, N > 2000)
+      "finished"   - all experiments done or stopped ("experiments", "precision_reached", "rel_error")
+    Callbacks run on the acquisition thread and must not block. With a
+    scheduler (instrument_scheduler.InstrumentScheduler) each experiment
+    holds the link through scheduler.acquisition(), so monitor queries only
+    run in the pauses between experiments.
+
+    With target_precision (e.g. 0.01 for 1 %) the run stops as soon as the
+    relative uncertainty of channel A's mean rate gets there, mid-experiment
+    when streaming; num_experiments and max_time (s) are then only caps.
+    precision_method "poisson" uses 1/sqrt(total counts), "empirical" the
+    standard error of the per-period counts.
+    """
+
+    def __init__(self, device, num_experiments=1, streaming=True, pause=0.1, scheduler=None, target_precision=None,
+                 precision_method="poisson", max_time=None):
+        self.device = device
+        self.scheduler = scheduler
+        self.target_precision = target_precision
+        self.precision_method = precision_method
+        self.max_time = max_time
+        self.precision_stats = StreamStats("AB")
+        self.precision_reached = False
+        self.start_time = None
+        self.num_experiments = num_experiments
+        self.streaming = streaming and hasattr(device, "stream_data")
+        self.pause = pause  # s between experiments
+        self.subscribers = []
+        self.thread = None
+        self.running = False
+        self.experiments_done = 0
+
+    def subscribe(self, callback):
+        """Registers callback(event); returns it so it can be unsubscribed."""
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def publish(self, kind, **payload):
+        payload["kind"] = kind
+        for callback in list(self.subscribers):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Error in acquisition subscriber: {e}")
+
+    def start(self):
+        """Starts the experiments in a daemon thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Asks the run to stop after the current chunk and stops the counter.
+
+        The CR goes out right away, without waiting for the scheduler: it
+        interrupts the acquisition that holds the link.
+        """
+        self.running = False
+        if hasattr(self.device, "stop_acquisition"):
+            self.device.stop_acquisition()
+
+    def join(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def is_running(self):
+        return self.running
+
+    def relative_error(self):
+        """Relative uncertainty of channel A's mean so far (None before there is any signal)."""
+        stats = self.precision_stats["A"]
+        if self.precision_method == "empirical":
+            if stats.count < 2 or not stats.mean:
+                return None
+            return stats.std / np.sqrt(stats.count) / abs(stats.mean)
+        return 1.0 / np.sqrt(stats.total) if stats.total > 0 else None
+
+    def track_precision(self, data):
+        """Feeds rows into the precision statistics; True once the target is reached."""
+        if self.target_precision is None:
+            return False
+        self.precision_stats.update(data)
+        error = self.relative_error()
+        if error is not None and error <= self.target_precision:
+            self.precision_reached = True
+        return self.precision_reached
+
+    def time_up(self):
+        return self.max_time is not None and time.time() - self.start_time >= self.max_time
+
+    def should_continue(self):
+        return self.running and not self.precision_reached and not self.time_up()
+
+    def run(self):
+        """Runs the experiments in the calling thread."""
+        self.running = True
+        self.experiments_done = 0
+        self.precision_stats = StreamStats("AB")
+        self.precision_reached = False
+        self.start_time = time.time()
+        try:
+            while self.should_continue() and self.experiments_done < self.num_experiments:
+                experiment = self.experiments_done + 1
+                self.publish("start", experiment=experiment)
+                try:
+                    with self.scheduler.acquisition() if self.scheduler else nullcontext():
+                        data = self.acquire(experiment)
+                except Exception as e:
+                    print(f"Error reading data from device: {e}")
+                    data = None
+                self.experiments_done = experiment
+                if data is not None and len(data):
+                    if not self.streaming:
+                        self.track_precision(data)
+                    avg_a, avg_b = channel_averages(data)
+                    self.publish("experiment", experiment=experiment, data=data, avg_a=avg_a, avg_b=avg_b,
+                                 rel_error=self.relative_error(), boundaries=self.boundaries())
+                if self.should_continue() and self.experiments_done < self.num_experiments:
+                    time.sleep(self.pause)
+        finally:
+            self.running = False
+            self.publish("finished", experiments=self.experiments_done, precision_reached=self.precision_reached,
+                         rel_error=self.relative_error())
+
+    def boundaries(self):
+        """(period index, dead time in s) at each stitch of the last experiment; empty unless N > 2000."""
+        continuous = getattr(self.device, "continuous", None)
+        return continuous.boundaries() if continuous is not None else []
+
+    def acquire(self, experiment):
+        if not self.streaming:
+            data = self.device.acquire_data()
+            return None if data is None else np.asarray(data)
+        chunks = []
+        for chunk in self.device.stream_data(should_continue=self.should_continue):
+            chunks.append(chunk)
+            self.track_precision(chunk)
+            self.publish("chunk", experiment=experiment, data=chunk)
+        return np.concatenate(chunks) if chunks else None
+
+
+def channel_averages(data):
+    """Mean of column A and B (0.0 if a column is missing)."""
+    data = np.asarray(data)
+    if data.ndim != 2 or not data.size:
+        return 0.0, 0.0
+    avg_a = float(data[:, 0].mean())
+    avg_b = float(data[:, 1].mean()) if data.shape[1] > 1 else 0.0
+    return avg_a, avg_b
+
+
+def main(argv=None):
+    """Headless runs: python acquisition_engine.py sim --tset 0.001 --periods 2000 -m 10 --output run.txt"""
+    from sr400_device import SR400Device
+    from continuous import save_boundaries
+    from recorder import Recorder
+    from run_catalog import RunCatalog
+    from runfile import RunWriter
+
+    parser = argparse.ArgumentParser(description="Headless SR400 acquisition.")
+    parser.add_argument("resource", help='e.g. "ASRL5::INSTR", "prologix:COM5:23" or "sim"')
+    parser.add_argument("--tset", type=float, default=0.001)
+    parser.add_argument("--periods", type=int, default=2000)
+    parser.add_argument("-m", "--experiments", type=int,
+                        help="experiments to run (default 1), or the most to run with --precision (default 1000)")
+    parser.add_argument("--precision", type=float, help="stop once A's mean is known to this relative error, e.g. 0.01")
+    parser.add_argument("--method", default="poisson", choices=["poisson", "empirical"])
+    parser.add_argument("--max-time", type=float, help="longest run with --precision, s")
+    parser.add_argument("--waveform", help="write counts vs. period index, averaged over the experiments, as CSV")
+    parser.add_argument("--output", help='append rows as "timestamp - values" lines, or a binary run if *.sr4; '
+                                         'with --periods > 2000 the gaps between runs go to OUTPUT.gaps.csv')
+    args = parser.parse_args(argv)
+    if args.experiments is None:
+        args.experiments = 1000 if args.precision else 1
+
+    device = SR400Device(args.resource)
+    device.tset = args.tset
+    device.num_periods = args.periods
+    engine = AcquisitionEngine(device, args.experiments, target_precision=args.precision,
+                               precision_method=args.method, max_time=args.max_time)
+    output = None
+    appended = False  # text output added to an existing file: index the whole file once it is closed
+    catalog = RunCatalog() if args.output else None  # runs.sqlite next to the recordings, like the GUI
+    params = {"tset": args.tset, "num_periods": args.periods, "experiments": args.experiments,
+              "disc_level": device.disc_levels.get("A")}
+    if args.output and args.output.endswith(".sr4"):
+        output = RunWriter(args.output, catalog=catalog, **params)
+    elif args.output:
+        appended = os.path.exists(args.output)
+        output = Recorder(args.output, mode="a", catalog=None if appended else catalog, params=params).start()
+
+    def on_event(event):
+        if event["kind"] == "chunk" and output:
+            output.write_rows(event["data"])
+        elif event["kind"] == "experiment":
+            print(f"Experiment {event['experiment']} completed: A={event['avg_a']:.1f}, B={event['avg_b']:.1f}"
+                  + (f", rel. error {event['rel_error']:.4f}" if event["rel_error"] is not None else ""))
+            if args.output:
+                save_boundaries(args.output, event["experiment"], event["boundaries"])
+        elif event["kind"] == "finished":
+            # -m is only a cap with --precision: header and catalog get the experiments actually run
+            params["experiments"] = event["experiments"]
+            if isinstance(output, RunWriter):
+                output.experiments = event["experiments"]
+        if event["kind"] == "finished" and args.precision:
+            print(f"Target {args.precision} {'reached' if event['precision_reached'] else 'not reached'} "
+                  f"after {event['experiments']} experiments")
+
+    waveform = None
+    if args.waveform:
+        from waveform import WaveformAccumulator
+        waveform = WaveformAccumulator(args.periods, "A")
+        engine.subscribe(waveform.on_event)
+    engine.subscribe(on_event)
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        engine.stop()
+    finally:
+        if output:
+            output.stop()
+            if appended:
+                try:
+                    catalog.register_file(args.output, **params)
+                except Exception as e:
+                    print(f"Error registering {args.output} in the run catalog: {e}")
+        if waveform:
+            waveform.save(args.waveform)
+        device.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#benchmark_acquisition.py
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from queue import Queue
+
+from sr400_sim import SimulatedSR400
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QT_DIR = os.path.join(HERE, "..", "app via QT1")
+
+
+class CountingResource:
+    """Wraps a resource and counts the bytes that come back from it."""
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.bytes_read = 0
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+    def read(self):
+        response = self.resource.read()
+        self.bytes_read += len(response)
+        return response
+
+    def query(self, message):
+        response = self.resource.query(message)
+        self.bytes_read += len(response)
+        return response
+
+    def read_bytes(self, count, break_on_termchar=False):
+        data = self.resource.read_bytes(count, break_on_termchar=break_on_termchar)
+        self.bytes_read += len(data)
+        return data
+
+
+def make_device(tset, num_periods, rate):
+    """An SR400Device on a simulator, bypassing resource discovery."""
+    from sr400_device import SR400Device
+    device = SR400Device("sim")
+    device.sr400 = CountingResource(SimulatedSR400(rate_a=rate, rate_b=rate / 10))
+    device.tset = tset
+    device.num_periods = num_periods
+    return device
+
+
+def summarize(path, tset, num_periods, m, period_time, times, periods, bytes_read):
+    wall = sum(times)
+    counting = m * num_periods * period_time
+    return {
+        "path": path,
+        "tset": tset,
+        "num_periods": num_periods,
+        "M": m,
+        "periods": periods,
+        "wall_s": wall,
+        "experiment_wall_s": times,
+        "periods_per_s": periods / wall if wall else None,
+        "bytes_per_s": bytes_read / wall if wall else None,
+        "dead_time_fraction": max(1.0 - counting / wall, 0.0) if wall else None,
+    }
+
+
+def bench_acquire_data(tset, num_periods, m, rate, bulk_dump=True):
+    device = make_device(tset, num_periods, rate)
+    device.bulk_dump = bulk_dump
+    times = []
+    periods = 0
+    for _ in range(m):
+        started = time.perf_counter()
+        data = device.acquire_data()
+        times.append(time.perf_counter() - started)
+        periods += 0 if data is None else len(data)
+    path = "SR400Device.acquire_data" + ("" if bulk_dump else "[per-line]")
+    return summarize(path, tset, num_periods, m, device.period_time, times, periods, device.sr400.bytes_read)
+
+
+def bench_start_counting(tset, num_periods, m, rate, batched=True):
+    """Times start_counting() from a cold settings cache, from device.last_batch (commands, writes, s)."""
+    device = make_device(tset, num_periods, rate)
+    if not batched:
+        device.MAX_BATCH_CHARS = 1  # every command gets a write of its own, as before batching
+    times = []
+    for _ in range(m):
+        device.invalidate_state()  # CP2 and NP go out every time
+        device.start_counting()
+        device.sr400.write("CR\n")
+        times.append(device.last_batch[2])
+    commands, writes, _ = device.last_batch
+    return {
+        "path": "SR400Device.start_counting" + ("" if batched else "[per-command]"),
+        "tset": tset,
+        "num_periods": num_periods,
+        "M": m,
+        "commands": commands,
+        "writes": writes,
+        "start_s": times,
+        "mean_start_s": sum(times) / len(times) if times else None,
+    }
+
+
+def bench_stream_data(tset, num_periods, m, rate):
+    device = make_device(tset, num_periods, rate)
+    times = []
+    periods = 0
+    for _ in range(m):
+        started = time.perf_counter()
+        periods += sum(len(chunk) for chunk in device.stream_data())
+        times.append(time.perf_counter() - started)
+    return summarize("SR400Device.stream_data", tset, num_periods, m, device.period_time, times, periods,
+                     device.sr400.bytes_read)
+
+
+def load_qt():
+    """Imports qt.py and Control_sr400.py, or returns None if PySide6/pyvisa are missing."""
+    if QT_DIR not in sys.path:
+        sys.path.append(QT_DIR)
+    try:
+        import qt
+        from Control_sr400 import Sr400
+    except ImportError as e:
+        print(f"Skipping Qt workers: {e}", file=sys.stderr)
+        return None
+    return qt, Sr400
+
+
+def make_qt_driver(Sr400, tset, num_periods, dwell, rate):
+    driver = Sr400(n_counts=num_periods, t_set=tset, dwel_time=dwell, resource="sim")
+    driver.sr4 = CountingResource(SimulatedSR400(rate_a=rate, rate_b=rate / 10))
+    driver.invalidate_state()
+    return driver
+
+
+def bench_qt_worker(qt_modules, tset, num_periods, m, rate, dwell=0.002):
+    qt, Sr400 = qt_modules
+    driver = make_qt_driver(Sr400, tset, num_periods, dwell, rate)
+    times = []
+    periods = 0
+    for _ in range(m):
+        results = []
+        worker = qt.Worker(driver, tset, num_periods, dwell)
+        worker.finished.connect(results.append)
+        started = time.perf_counter()
+        worker.run()
+        times.append(time.perf_counter() - started)
+        if results and results[0] is not None:
+            periods += len(results[0][0])
+    result = summarize("qt.Worker", tset, num_periods, m, tset + dwell, times, periods, driver.sr4.bytes_read)
+    result["last_batch"] = driver.last_batch  # (commands, writes, s) of the last start_count()
+    return result
+
+
+def bench_qt_worker_live(qt_modules, tset, num_periods, m, rate, dwell=8e-3):
+    """dwell is the GUI's default dwell, which is never sent to the SR400: the live schedule must not rely on it."""
+    qt, Sr400 = qt_modules
+    driver = make_qt_driver(Sr400, tset, num_periods, dwell, rate)
+    wanted = num_periods * m
+    points = []
+    worker = qt.WorkerLive(driver, tset, num_periods, dwell)
+
+    def on_progress(data):
+        points.append(data)
+        if len(points) >= wanted:
+            worker.stop()
+
+    worker.progress.connect(on_progress)
+    started = time.perf_counter()
+    worker.run()
+    wall = time.perf_counter() - started
+    return summarize("qt.WorkerLive", tset, num_periods, m, tset + driver.sr4.resource.dwell, [wall], len(points),
+                     driver.sr4.bytes_read)
+
+
+def bench_read_data_realtime(num_periods, m):
+    """Times App.read_data_realtime parsing a recorded file of M*N rows into its queue."""
+    try:
+        import modified_1519reader as reader
+    except ImportError as e:
+        print(f"Skipping read_data_realtime: {e}", file=sys.stderr)
+        return None
+    rows = num_periods * m
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        for i in range(rows):
+            f.write(f"{time.time()} - {float(i % 97)}\n")
+        path = f.name
+    try:
+        app = types.SimpleNamespace(data_source=path, data_queue=Queue(), last_read_pos=0,
+                                    UPDATE_INTERVAL=0.01, reading=True, data_file=open(path, "r"))
+        thread = threading.Thread(target=reader.App.read_data_realtime, args=(app,), daemon=True)
+        started = time.perf_counter()
+        thread.start()
+        while app.data_queue.qsize() < rows and thread.is_alive():
+            time.sleep(0.001)
+        wall = time.perf_counter() - started
+        app.reading = False
+        thread.join(1.0)
+        app.data_file.close()
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    result = summarize("App.read_data_realtime", None, num_periods, m, 0.0, [wall], rows, size)
+    result["dead_time_fraction"] = None  # no counting involved
+    return result
+
+
+def run_matrix(tsets, periods_list, ms, rate, paths):
+    results = []
+    qt_modules = load_qt() if {"worker", "worker_live"} & set(paths) else None
+    for tset, num_periods, m in itertools.product(tsets, periods_list, ms):
+        print(f"tset={tset} N={num_periods} M={m}", file=sys.stderr)
+        if "acquire" in paths:
+            results.append(bench_acquire_data(tset, num_periods, m, rate))
+        if "acquire_per_line" in paths:
+            results.append(bench_acquire_data(tset, num_periods, m, rate, bulk_dump=False))
+        if "start" in paths:
+            results.append(bench_start_counting(tset, num_periods, m, rate))
+            results.append(bench_start_counting(tset, num_periods, m, rate, batched=False))
+        if "stream" in paths:
+            results.append(bench_stream_data(tset, num_periods, m, rate))
+        if qt_modules and "worker" in paths:
+            results.append(bench_qt_worker(qt_modules, tset, num_periods, m, rate))
+        if qt_modules and "worker_live" in paths:
+            results.append(bench_qt_worker_live(qt_modules, tset, num_periods, m, rate))
+    if "realtime" in paths:
+        for num_periods, m in itertools.product(periods_list, ms):
+            result = bench_read_data_realtime(num_periods, m)
+            if result:
+                results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Acquisition throughput benchmark against the simulated SR400.")
+    parser.add_argument("--tset", type=float, nargs="+", default=[0.001, 0.01])
+    parser.add_argument("--periods", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--m", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--rate", type=float, default=5000.0, help="channel A counts/s")
+    parser.add_argument("--paths", nargs="+",
+                        default=["acquire", "acquire_per_line", "start", "stream", "worker", "worker_live", "realtime"])
+    parser.add_argument("--output", default="-", help="JSON file, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    # The drivers print progress to stdout; keep it for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run_matrix(args.tset, args.periods, args.m, args.rate, args.paths)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
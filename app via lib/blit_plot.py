@@ -0,0 +1,87 @@
+#blit_plot.py
+import numpy as np
+
+
+class BlitPlot:
+    """Persistent lines on one Axes, redrawn by blitting only the axes region.
+
+    The title, labels, grid and legend are drawn once into a cached
+    background. update() moves the line data, restores that background
+    and draws just the lines. A full canvas.draw() only happens when the
+    data leaves the current limits (or the window is resized); the limits
+    then grow with some headroom so that the next points fit without
+    another full redraw.
+    """
+
+    def __init__(self, canvas, ax, lines, headroom=0.5, margin=0.1):
+        self.canvas = canvas
+        self.ax = ax
+        self.lines = list(lines)
+        self.headroom = headroom  # extra x range added when the data runs past the right edge
+        self.margin = margin  # part of the y range added above and below
+        self.background = None
+        self.limits = None  # (x0, x1, y0, y1) currently set on the axes
+        self.y_seen = None  # unpadded y range the limits were made for
+        for line in self.lines:
+            line.set_animated(True)
+        self.draw_cid = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """Full redraw finished: keep the static part and put the lines back."""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def reset(self):
+        """Forgets the limits so the next update() fits the axes to the data again."""
+        self.limits = None
+        self.y_seen = None
+
+    def data_limits(self):
+        xs, ys = [], []
+        for line in self.lines:
+            x, y = line.get_data()
+            if len(x):
+                xs.append(np.asarray(x, dtype=np.float64))
+                ys.append(np.asarray(y, dtype=np.float64))
+        if not xs:
+            return None
+        x, y = np.concatenate(xs), np.concatenate(ys)
+        return float(np.nanmin(x)), float(np.nanmax(x)), float(np.nanmin(y)), float(np.nanmax(y))
+
+    def rescale(self, data):
+        x0, x1, y0, y1 = data
+        if self.y_seen is not None:
+            # x follows the data (rolling windows move right), y only grows so it does not jump around
+            y0, y1 = min(y0, self.y_seen[0]), max(y1, self.y_seen[1])
+        self.y_seen = (y0, y1)
+        span = x1 - x0 or 1.0
+        x1 += span * self.headroom
+        pad = (y1 - y0) * self.margin or 1.0
+        self.limits = (x0, x1, y0 - pad, y1 + pad)
+        self.ax.set_xlim(self.limits[0], self.limits[1])
+        self.ax.set_ylim(self.limits[2], self.limits[3])
+
+    def update(self, data=None):
+        """data: [(x, y)] per line (None keeps a line's data as it is); redraws the lines."""
+        if data is not None:
+            for line, xy in zip(self.lines, data):
+                if xy is not None:
+                    line.set_data(*xy)
+        limits = self.data_limits()
+        if limits is not None and (self.limits is None or limits[0] < self.limits[0] or limits[1] > self.limits[1]
+                                   or limits[2] < self.limits[2] or limits[3] > self.limits[3]):
+            self.rescale(limits)
+            self.background = None
+        if self.background is None:
+            self.canvas.draw()  # on_draw() caches the new background and draws the lines
+            return
+        self.canvas.restore_region(self.background)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
+    def redraw(self):
+        """Full redraw, e.g. after a title or label change."""
+        self.background = None
+        self.update()
@@ -0,0 +1,111 @@
+#continuous.py
+import os
+import time
+import numpy as np
+
+MAX_PERIODS = 2000  # size of the SR400 A/B buffers
+
+
+class Segment:
+    """One hardware run inside a stitched series, with its dead-time annotation."""
+
+    def __init__(self, index, first_period, num_periods, start_time, period_time, dead_time):
+        self.index = index
+        self.first_period = first_period  # offset of this run in the stitched series
+        self.num_periods = num_periods
+        self.start_time = start_time  # wall time of CS
+        self.period_time = period_time  # tset + dwell
+        self.dead_time = dead_time  # s not counted between the previous run and this one
+        self.received = 0
+
+    @property
+    def count_end_time(self):
+        """Estimated wall time when this run stopped counting."""
+        return self.start_time + self.num_periods * self.period_time
+
+    def __repr__(self):
+        return (f"Segment({self.index}, periods {self.first_period}..{self.first_period + self.received}, "
+                f"dead_time={self.dead_time:.4f}s)")
+
+
+class ContinuousAcquisition:
+    """Chains back-to-back SR400 runs into one series longer than the 2000-period buffer.
+
+    Every run is streamed with device.stream_run(), so the dump overlaps
+    counting and the only gap between runs is the tail of the transfer plus
+    the reset/start commands. That gap is recorded as Segment.dead_time.
+    """
+
+    def __init__(self, device, total_periods, channel="A", periods_per_run=MAX_PERIODS):
+        self.device = device
+        self.total_periods = total_periods
+        self.channel = channel
+        self.periods_per_run = min(periods_per_run, MAX_PERIODS)
+        self.segments = []
+
+    def chunks(self, should_continue=None):
+        """Yields int arrays of completed periods across all runs, in order; prints the stitches at the end."""
+        self.segments = []
+        done = 0
+        try:
+            while done < self.total_periods:
+                if should_continue is not None and not should_continue():
+                    break
+                n = min(self.periods_per_run, self.total_periods - done)
+                segment = None
+                for chunk in self.device.stream_run(n, self.channel, should_continue):
+                    if segment is None:
+                        segment = self._open_segment(done, n)
+                    segment.received += len(chunk)
+                    yield chunk
+                if segment is None or segment.received < n:
+                    print(f"Run {len(self.segments)} ended early, stopping continuous acquisition")
+                    break
+                done += n
+        finally:
+            if self.segments:
+                self.report()
+
+    def run(self, should_continue=None):
+        """Acquires the whole series and returns it as one array."""
+        parts = list(self.chunks(should_continue))
+        if not parts:
+            return None
+        return np.concatenate(parts)
+
+    def report(self):
+        """Prints the number of runs, the total dead time and the gap at every stitch."""
+        print(f"Continuous run: {len(self.segments)} runs, dead time {self.total_dead_time():.3f} s")
+        for period, dead_time in self.boundaries():
+            print(f"  gap before period {period + 1}: {dead_time * 1000:.1f} ms")
+
+    def _open_segment(self, first_period, num_periods):
+        start = self.device.last_start_time or time.time()
+        if self.segments:
+            dead_time = max(start - self.segments[-1].count_end_time, 0.0)
+        else:
+            dead_time = 0.0
+        segment = Segment(len(self.segments), first_period, num_periods, start, self.device.period_time, dead_time)
+        self.segments.append(segment)
+        return segment
+
+    def total_dead_time(self):
+        """Sum of the gaps between runs, in seconds."""
+        return sum(segment.dead_time for segment in self.segments)
+
+    def boundaries(self):
+        """(period index, dead time) for every stitch point in the series."""
+        return [(segment.first_period, segment.dead_time) for segment in self.segments[1:]]
+
+
+def save_boundaries(filename, experiment, boundaries):
+    """Appends "experiment,period,dead_time_s" rows for each stitch to `filename`.gaps.csv."""
+    if not boundaries:
+        return
+    path = filename + ".gaps.csv"
+    new = not os.path.exists(path)
+    with open(path, "a") as f:
+        if new:
+            f.write("experiment,period,dead_time_s\n")
+        for period, dead_time in boundaries:
+            f.write(f"{experiment},{period},{dead_time:.6f}\n")
@@ -0,0 +1,186 @@
+#decimate.py
+import numpy as np
+
+
+def minmax(x, y, bins):
+    """Keeps the min and the max point of each of `bins` equal slices, in their original order."""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    if len(y) <= 2 * bins:
+        return x, y
+    edges = np.linspace(0, len(y), bins + 1).astype(np.int64)
+    starts = edges[:-1]
+    imin = starts + _segment_arg(y, edges, np.minimum)
+    imax = starts + _segment_arg(y, edges, np.maximum)
+    keep = np.unique(np.concatenate((imin, imax)))
+    return x[keep], y[keep]
+
+
+def _segment_arg(y, edges, ufunc):
+    """Position of the ufunc-extreme inside each [edges[i], edges[i+1]) slice."""
+    extreme = ufunc.reduceat(y, edges[:-1])
+    owner = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    hits = np.flatnonzero(y == extreme[owner])
+    first = np.unique(owner[hits], return_index=True)[1]
+    return hits[first] - edges[:-1]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: `threshold` points that keep the visual shape of the line."""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+class _Buffer:
+    """Growable 1D array (capacity doubles) so appends one point at a time stay cheap."""
+
+    def __init__(self, dtype=np.float64):
+        self.data = np.zeros(64, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype).ravel()
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.zeros(max(end, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+    @property
+    def view(self):
+        return self.data[:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+class DecimatedSeries:
+    """An evenly spaced series (x = x0, x0 + dx, ...) with a min/max pyramid for plotting.
+
+    Level k keeps, for each block of FACTOR**k raw points, where the minimum
+    and the maximum are. view() picks the level that gives about `pixels`
+    blocks for the visible range, so a redraw costs O(pixels) however many
+    points were appended, and single-period peaks and dips stay visible.
+    """
+
+    FACTOR = 4
+
+    def __init__(self, x0=1.0, dx=1.0):
+        self.x0 = x0
+        self.dx = dx
+        self.raw = _Buffer()
+        self.levels = []  # [(imin, imax) buffers of raw indices], level 1 first
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def values(self):
+        return self.raw.view
+
+    @property
+    def x(self):
+        return self.x0 + self.dx * np.arange(len(self.raw))
+
+    def clear(self):
+        self.raw = _Buffer()
+        self.levels = []
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        self.raw.extend(values)
+        self._build()
+
+    def _build(self):
+        y = self.raw.view
+        below_min = below_max = None  # level 0: every raw point is its own min and max
+        below_size = len(y)
+        k = 0
+        while below_size >= self.FACTOR:
+            if k == len(self.levels):
+                self.levels.append((_Buffer(np.int64), _Buffer(np.int64)))
+            imin_buf, imax_buf = self.levels[k]
+            done = len(imin_buf)
+            complete = below_size // self.FACTOR
+            if complete > done:
+                lo, hi = done * self.FACTOR, complete * self.FACTOR
+                if below_min is None:
+                    cand_min = cand_max = np.arange(lo, hi, dtype=np.int64).reshape(-1, self.FACTOR)
+                else:
+                    cand_min = below_min[lo:hi].reshape(-1, self.FACTOR)
+                    cand_max = below_max[lo:hi].reshape(-1, self.FACTOR)
+                rows = np.arange(len(cand_min))
+                imin_buf.extend(cand_min[rows, y[cand_min].argmin(axis=1)])
+                imax_buf.extend(cand_max[rows, y[cand_max].argmax(axis=1)])
+            below_min, below_max = imin_buf.view, imax_buf.view
+            below_size = len(below_min)
+            k += 1
+
+    def _tail(self, level):
+        """(imin, imax) over the raw points after the last complete block of `level`, or None."""
+        block = self.FACTOR ** level
+        start = (len(self.raw) // block) * block
+        if start == len(self.raw):
+            return None
+        y = self.raw.view
+        candidates = []
+        # Walk down the pyramid: fewer than FACTOR complete blocks per level, then < FACTOR raw points
+        for k in range(level - 1, 0, -1):
+            imin_buf, imax_buf = self.levels[k - 1]
+            first, last = start // self.FACTOR ** k, len(imin_buf)
+            candidates.append((imin_buf.view[first:last], imax_buf.view[first:last]))
+            start = max(start, last * self.FACTOR ** k)
+        rest = np.arange(start, len(self.raw), dtype=np.int64)
+        candidates.append((rest, rest))
+        imin = np.concatenate([c[0] for c in candidates])
+        imax = np.concatenate([c[1] for c in candidates])
+        return imin[y[imin].argmin()], imax[y[imax].argmax()]
+
+    def view(self, x_min=None, x_max=None, pixels=1000, method="minmax"):
+        """(x, y) to hand to Line2D.set_data for the range [x_min, x_max] on a `pixels`-wide axes."""
+        n = len(self.raw)
+        i0 = 0 if x_min is None else int(np.clip(np.floor((x_min - self.x0) / self.dx), 0, n))
+        i1 = n if x_max is None else int(np.clip(np.ceil((x_max - self.x0) / self.dx) + 1, i0, n))
+        y = self.raw.view
+        pixels = max(int(pixels), 2)  # collapsed axes still get a line from the first to the last point
+        if i1 - i0 <= 2 * pixels or not self.levels:
+            index = np.arange(i0, i1)
+        else:
+            level = 1
+            while level < len(self.levels) and (i1 - i0) / self.FACTOR ** level > pixels:
+                level += 1
+            level = min(level, len(self.levels))
+            block = self.FACTOR ** level
+            imin_buf, imax_buf = self.levels[level - 1]
+            b0, b1 = i0 // block, min(-(-i1 // block), len(imin_buf))
+            imin, imax = imin_buf.view[b0:b1], imax_buf.view[b0:b1]
+            if i1 > len(imin_buf) * block:
+                tail = self._tail(level)
+                if tail is not None:
+                    imin, imax = np.append(imin, tail[0]), np.append(imax, tail[1])
+            # The first and last visible points too, so the line spans the whole range
+            index = np.unique(np.concatenate((imin, imax, [i0, i1 - 1])))
+        xs = self.x0 + self.dx * index
+        ys = y[index]
+        if method == "lttb":
+            return lttb(xs, ys, pixels)
+        return xs, ys
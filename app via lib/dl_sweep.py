@@ -0,0 +1,263 @@
+#dl_sweep.py
+import argparse
+import datetime
+import os
+import time
+import numpy as np
+from online_stats import StreamStats
+
+
+class SweepPoint:
+    """Counts at one discriminator level: running stats of one channel plus when it was measured."""
+
+    def __init__(self, level, channel="A", tset=None):
+        self.level = level  # V
+        self.channel = channel
+        self.tset = tset
+        self.stats = StreamStats(channel)
+        self.start_time = time.time()
+        self.end_time = None
+        self.refined = False  # added by refine() rather than from the initial grid
+
+    @property
+    def mean(self):
+        return self.stats[self.channel].mean
+
+    @property
+    def sem(self):
+        """Standard error of the mean count per period."""
+        stats = self.stats[self.channel]
+        return stats.std / np.sqrt(stats.count) if stats.count > 1 else 0.0
+
+    @property
+    def rate(self):
+        """Mean count rate, counts/s."""
+        return self.mean / self.tset if self.tset else None
+
+    def row(self):
+        stats = self.stats[self.channel]
+        return [self.level * 1000.0, stats.count, self.mean, stats.std, self.sem, self.rate or 0.0, int(self.refined)]
+
+
+class SweepResult:
+    """All points of a sweep, kept sorted by level."""
+
+    COLUMNS = ["level_mV", "periods", "mean", "std", "sem", "rate", "refined"]
+
+    def __init__(self, channel="A", tset=None, num_periods=None):
+        self.channel = channel
+        self.tset = tset
+        self.num_periods = num_periods
+        self.points = []
+        self.start_time = time.time()
+
+    def add(self, point):
+        self.points.append(point)
+        self.points.sort(key=lambda p: p.level)
+
+    def levels(self):
+        return np.array([p.level for p in self.points])
+
+    def curve(self):
+        """(levels in V, mean counts per period, standard errors) for plotting."""
+        return (self.levels(), np.array([p.mean for p in self.points]), np.array([p.sem for p in self.points]))
+
+    def steepest(self, min_step, significance=2.0):
+        """Level interval (low, high) with the largest significant change in mean, or None."""
+        best = None
+        best_change = 0.0
+        for low, high in zip(self.points, self.points[1:]):
+            if high.level - low.level < 2 * min_step:
+                continue
+            change = abs(high.mean - low.mean)
+            noise = np.hypot(low.sem, high.sem)
+            if change <= significance * noise:
+                continue
+            if change > best_change:
+                best, best_change = (low.level, high.level), change
+        return best
+
+    def save(self, path):
+        """Writes the curve as CSV, one row per level, with the sweep settings in a comment line."""
+        with open(path, "w") as f:
+            f.write(f"# channel {self.channel}, tset {self.tset}, periods {self.num_periods}, "
+                    f"started {datetime.datetime.fromtimestamp(self.start_time):%Y-%m-%d %H:%M:%S}\n")
+            f.write(",".join(self.COLUMNS) + "\n")
+            for point in self.points:
+                f.write(",".join(f"{value:g}" for value in point.row()) + "\n")
+
+
+class DiscriminatorSweep:
+    """Steps the SR400 discriminator level (DL) and measures the count rate at every level.
+
+    Each level streams its periods into a SweepPoint as they arrive;
+    callback(event) gets {"kind": "chunk"|"level"|"finished", "point", "result"}
+    so a front end can draw the curve live. After the grid, refine() keeps
+    bisecting the interval where the mean changes the most (and more than
+    the noise) until max_refine extra levels are measured or the
+    intervals are down to min_step.
+    """
+
+    def __init__(self, device, levels, channel="A", refine=0, min_step=0.001, callback=None, record_dir=None,
+                 catalog=None):
+        self.device = device
+        self.levels = [float(level) for level in levels]  # V
+        self.channel = channel
+        self.max_refine = refine
+        self.min_step = min_step  # V
+        self.callback = callback
+        self.record_dir = record_dir  # write "+250.txt"-style files per level, like the voltage set/ recordings
+        self.catalog = catalog  # RunCatalog for the recorded level files
+        self.running = False
+        self.result = SweepResult(channel, getattr(device, "tset", None), getattr(device, "num_periods", None))
+
+    def publish(self, kind, point=None):
+        if self.callback is not None:
+            try:
+                self.callback({"kind": kind, "point": point, "result": self.result})
+            except Exception as e:
+                print(f"Error in sweep callback: {e}")
+
+    def stop(self):
+        self.running = False
+        if hasattr(self.device, "stop_acquisition"):
+            self.device.stop_acquisition()
+
+    def measure(self, level, refined=False):
+        """Sets DL to `level` (V), acquires one run and returns its SweepPoint."""
+        self.device.set_discriminator(self.channel, level)
+        point = SweepPoint(level, self.channel, self.result.tset)
+        point.refined = refined
+        recorder = self.open_recorder(level)
+        for chunk in self.device.stream_data(self.channel, should_continue=lambda: self.running):
+            point.stats.update(chunk)
+            if recorder:
+                recorder.write_rows(chunk)
+            self.publish("chunk", point)
+        point.end_time = time.time()
+        if recorder:
+            recorder.stop()
+        self.result.add(point)
+        self.publish("level", point)
+        return point
+
+    def open_recorder(self, level):
+        if not self.record_dir:
+            return None
+        from recorder import Recorder
+        os.makedirs(self.record_dir, exist_ok=True)
+        params = {"tset": self.result.tset, "num_periods": self.result.num_periods, "experiments": 1,
+                  "disc_level": level}
+        path = os.path.join(self.record_dir, level_file_name(level))
+        return Recorder(path, catalog=self.catalog, params=params).start()
+
+    def refine(self):
+        """Bisects the steepest significant interval up to max_refine times."""
+        for _ in range(self.max_refine):
+            if not self.running:
+                break
+            interval = self.result.steepest(self.min_step)
+            if interval is None:
+                break
+            self.measure(round((interval[0] + interval[1]) / 2, 6), refined=True)
+
+    def run(self):
+        """Measures the grid, then refines; returns the SweepResult."""
+        self.running = True
+        try:
+            for level in self.levels:
+                if not self.running:
+                    break
+                self.measure(level)
+            self.refine()
+        finally:
+            self.running = False
+            self.publish("finished")
+        return self.result
+
+
+def level_file_name(level):
+    """"+250.txt" for whole mV, finer levels in integer uV: "+212500uV.txt" ("+212.5.txt" would read as a repeat of +212)."""
+    microvolts = int(round(level * 1e6))
+    if microvolts % 1000 == 0:
+        return f"{microvolts // 1000:+d}.txt"
+    return f"{microvolts:+d}uV.txt"
+
+
+def level_grid(start, stop, step):
+    """Levels from start to stop inclusive (V)."""
+    count = int(round((stop - start) / step)) + 1
+    return [round(start + i * step, 6) for i in range(max(count, 1))]
+
+
+def main(argv=None):
+    """Unattended DL sweep: python dl_sweep.py sim --start 0.1 --stop 0.3 --step 0.02 --refine 8 --output sweep.csv"""
+    from sr400_device import SR400Device
+
+    parser = argparse.ArgumentParser(description="SR400 discriminator-level sweep.")
+    parser.add_argument("resource", help='e.g. "ASRL5::INSTR", "prologix:COM5:23" or "sim"')
+    parser.add_argument("--start", type=float, default=0.1, help="first level, V")
+    parser.add_argument("--stop", type=float, default=0.3, help="last level, V")
+    parser.add_argument("--step", type=float, default=0.02, help="grid step, V")
+    parser.add_argument("--levels", type=float, nargs="+", help="explicit levels in V instead of start/stop/step")
+    parser.add_argument("--refine", type=int, default=0, help="extra levels placed where the curve is steepest")
+    parser.add_argument("--min-step", type=float, default=0.001, help="smallest level spacing for refinement, V")
+    parser.add_argument("--channel", default="A", choices=["A", "B"])
+    parser.add_argument("--tset", type=float, default=0.01)
+    parser.add_argument("--periods", type=int, default=200)
+    parser.add_argument("--output", default="sweep.csv")
+    parser.add_argument("--record-dir", help='also write every level as "+250.txt" and index it in runs.sqlite')
+    parser.add_argument("--plot", action="store_true", help="show the curve live (matplotlib)")
+    args = parser.parse_args(argv)
+
+    device = SR400Device(args.resource)
+    device.tset = args.tset
+    device.num_periods = args.periods
+    levels = args.levels or level_grid(args.start, args.stop, args.step)
+    catalog = None
+    if args.record_dir:
+        from run_catalog import RunCatalog
+        catalog = RunCatalog()
+
+    plot = None
+    if args.plot:
+        import matplotlib.pyplot as plt
+        plt.ion()
+        fig, ax = plt.subplots()
+        plot = (plt, ax)
+
+    def on_event(event):
+        point = event["point"]
+        if event["kind"] != "level":
+            return
+        print(f"DL {point.level * 1000:+.1f} mV: {point.mean:.2f} +- {point.sem:.2f} counts/period"
+              f"{' (refined)' if point.refined else ''}")
+        if plot:
+            plt, ax = plot
+            levels, means, sems = event["result"].curve()
+            ax.cla()
+            ax.errorbar(levels * 1000, means, yerr=sems, marker="o", linestyle="-", color="green")
+            ax.set_xlabel("mV")
+            ax.set_ylabel(f"Counts per period ({args.channel})")
+            ax.grid(True)
+            plt.pause(0.01)
+
+    sweep = DiscriminatorSweep(device, levels, args.channel, refine=args.refine, min_step=args.min_step,
+                               callback=on_event, record_dir=args.record_dir, catalog=catalog)
+    started = time.time()
+    try:
+        result = sweep.run()
+    except KeyboardInterrupt:
+        sweep.stop()
+        result = sweep.result
+    finally:
+        device.close()
+    result.save(args.output)
+    print(f"{len(result.points)} levels in {time.time() - started:.1f} s, curve written to {args.output}")
+    if plot:
+        plot[0].ioff()
+        plot[0].show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#instrument_scheduler.py
+import threading
+import time
+from contextlib import contextmanager
+from online_stats import ChannelStats
+
+
+class InstrumentScheduler:
+    """Owns the SR400 link: acquisitions first, then GUI commands, QA/QB monitor polls in the gaps.
+
+    Everything that talks to the device goes through acquisition() (bulk
+    runs, strict priority: no new monitor poll or command starts while one
+    is waiting) or command() (settings from the GUI). A monitor thread
+    sends the monitor queries in one line every `interval` seconds while
+    the link is free. Polls that fall due while the link is busy are
+    coalesced into one, served as soon as it frees up, and the time it
+    waited is kept in `delay` (ChannelStats, seconds).
+    """
+
+    def __init__(self, device, interval=0.5, commands=("QA", "QB"), callback=None):
+        self.device = device
+        self.interval = interval
+        self.commands = list(commands)
+        self.callback = callback  # callback({command: value}, delay) on the monitor thread
+        self.condition = threading.Condition()
+        self.owner = None  # "acquisition", "command", "monitor" or None
+        self.acquisitions_waiting = 0
+        self.running = False
+        self.thread = None
+        self.delay = ChannelStats()  # queueing delay of monitor polls
+        self.coalesced = 0  # polls merged into a later one because the link was busy
+        self.last_values = {}
+
+    def claim(self, kind, should_wait=None):
+        """Blocks until the link is free for `kind`; returns False if should_wait() turned False."""
+        with self.condition:
+            if kind == "acquisition":
+                self.acquisitions_waiting += 1
+            try:
+                while self.owner is not None or (kind != "acquisition" and self.acquisitions_waiting):
+                    if should_wait is not None and not should_wait():
+                        return False
+                    self.condition.wait(0.1)
+            finally:
+                if kind == "acquisition":
+                    self.acquisitions_waiting -= 1
+            self.owner = kind
+            return True
+
+    def release(self):
+        with self.condition:
+            self.owner = None
+            self.condition.notify_all()
+
+    @contextmanager
+    def acquisition(self):
+        """Holds the link for a bulk acquisition (preempts waiting commands and monitor polls)."""
+        self.claim("acquisition")
+        try:
+            yield self.device
+        finally:
+            self.release()
+
+    @contextmanager
+    def command(self):
+        """Holds the link for a settings change or a one-off query."""
+        self.claim("command")
+        try:
+            yield self.device
+        finally:
+            self.release()
+
+    def is_busy(self):
+        return self.owner == "acquisition" or self.acquisitions_waiting > 0
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def poll(self):
+        """Sends the monitor queries; returns {command: float value}."""
+        commands = list(self.commands)
+        if not commands:
+            return {}
+        if hasattr(self.device, "query_many"):
+            answers = self.device.query_many(commands)
+        else:
+            answers = [self.device.query(command) for command in commands]
+        values = {}
+        for command, answer in zip(commands, answers):
+            try:
+                values[command] = float(str(answer).strip())
+            except ValueError:
+                print(f"Bad {command} answer: {answer!r}")
+        return values
+
+    def run(self):
+        due = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            if now < due:
+                time.sleep(min(due - now, 0.05))
+                continue
+            if not self.claim("monitor", should_wait=lambda: self.running):
+                break
+            served = time.monotonic()
+            try:
+                values = self.poll()
+            except Exception as e:
+                print(f"Error reading monitor values: {e}")
+                values = {}
+            finally:
+                self.release()
+            waited = served - due
+            self.delay.update([waited])
+            missed = int(waited // self.interval)
+            self.coalesced += missed
+            due += self.interval * (missed + 1)
+            if values:
+                self.last_values = values
+                if self.callback is not None:
+                    try:
+                        self.callback(values, waited)
+                    except Exception as e:
+                        print(f"Error in monitor callback: {e}")
+
+    def report(self):
+        """Monitor polls served, coalesced and their queueing delay (s)."""
+        return {"polls": self.delay.count, "coalesced": self.coalesced,
+                "mean_delay": self.delay.mean, "max_delay": self.delay.max if self.delay.count else 0.0,
+                "last_delay": self.delay.last or 0.0}
@@ -1,66 +1,16 @@
 #main.py
+import sys
 import tkinter as tk
-import pyvisa
-import time
-import numpy as np
 import modified_1519reader as reader
-
-class SR400Device:
-    def __init__(self, resource_name):
-        self.rm = pyvisa.ResourceManager()
-        self.sr400 = self.rm.open_resource(resource_name)
-        self.tset = 0.001
-        self.num_periods = 2000
-
-    def acquire_data(self):
-        """Acquires data from the SR400."""
-        try:
-            self.sr400.write(f"CP2, {self.tset * 10 ** 7 + 1}\n")  # Set preset
-            print(f"установлен tset: {self.tset}")
-            self.sr400.write(f"NP {self.num_periods}\n")  # Set number of periods
-            time.sleep(1)
-            self.sr400.write("CR\n")
-            self.sr400.write("CS\n")
-            time.sleep(self.tset * (self.num_periods + 1)+1)
-
-            fa = []
-            self.sr400.write("EA\n")
-            for _ in range(self.num_periods):
-                response = self.sr400.read().rstrip()
-                if response:
-                    fa.append(list(map(int, response.split(','))))
-                else:
-                    print("Empty response received")
-            self.sr400.write("CR\n")
-            return fa
-        except Exception as e:
-            print(f"Error acquiring data: {e}")
-            return None
-
-    def stop_acquisition(self):
-        """Stops the SR400 acquisition gracefully."""
-        self.sr400.write("CR\n")
-
-    def close(self):
-        """Closes the connection to the SR400."""
-        self.sr400.close()
-        self.rm.close()
-
-    def query(self, command):
-        """Sends a query to the SR400 and returns the response."""
-        try:
-            response = self.sr400.query(command)
-            return response
-        except Exception as e:
-            print(f"Error sending query: {e}")
-            return None
+from continuous import MAX_PERIODS
+from sr400_device import SR400Device
 
 
 class MainApp:
-    def __init__(self, root):
+    def __init__(self, root, resource_name=None):
         self.root = root
         self.root.title("SR400 Control and Data Acquisition")
-        self.sr400_device = self.connect_to_sr400()
+        self.sr400_device = self.connect_to_sr400(resource_name)
 
         if self.sr400_device:
             self.reader_app = reader.App(self.root, data_source=self.sr400_device)
@@ -70,9 +20,18 @@ class MainApp:
             print("Failed to connect to SR400. Exiting.")
             self.root.destroy()
 
-    def connect_to_sr400(self):
+    def connect_to_sr400(self, resource_name=None):
         """Connects to the SR400 instrument."""
+        if resource_name:
+            try:
+                device = SR400Device(resource_name)
+                print(f"Connected to SR400 on {resource_name}")
+                return device
+            except Exception as e:
+                print(f"Error connecting to SR400: {e}")
+                return None
         try:
+            import pyvisa
             rm = pyvisa.ResourceManager()
             resources = rm.list_resources()
             sr400_resource = None
@@ -130,6 +89,21 @@ class MainApp:
         self.num_periods_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
         self.num_periods_entry.bind("<Return>", self.update_num_periods)
 
+        precision_frame = tk.Frame(self.reader_app.row3_frame, bg=self.reader_app.VALUE_BG, bd=2,
+                                   relief=tk.GROOVE)
+        precision_frame.grid(row=2, column=4, padx=5, pady=2, sticky="nsew")
+
+        precision_label = tk.Label(precision_frame, text="Prec (%):", font=self.reader_app.FONT_STYLE,
+                                   fg=self.reader_app.VALUE_FG, bg=self.reader_app.VALUE_BG,
+                                   width=self.reader_app.LABEL_WIDTH + 2)
+        precision_label.grid(row=0, column=0, padx=2, pady=2, sticky="w")
+
+        self.precision_entry = tk.Entry(precision_frame, font=self.reader_app.FONT_STYLE,
+                                        bg=self.reader_app.ENTRY_BG, fg=self.reader_app.ENTRY_FG,
+                                        width=self.reader_app.ENTRY_WIDTH)
+        self.precision_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+        self.precision_entry.bind("<Return>", self.update_precision)
+
     def update_tset(self, event):
         """Updates the Tset value in the SR400Device object."""
         try:
@@ -142,15 +116,34 @@ class MainApp:
         except ValueError:
             print("Invalid Tset value. Please enter a number.")
 
+    def update_precision(self, event):
+        """Sets the target relative precision (%) of A's mean; empty or 0 switches it off."""
+        text = self.precision_entry.get().strip()
+        try:
+            percent = float(text) if text else 0.0
+            if percent < 0:
+                raise ValueError
+        except ValueError:
+            print("Invalid precision. Enter a percentage, e.g. 1, or leave it empty.")
+            return
+        self.reader_app.target_precision = percent / 100 if percent else None
+        if percent:
+            print(f"Runs stop once A is known to {percent}% (at most "
+                  f"{self.reader_app.PRECISION_MAX_EXPERIMENTS} experiments / {self.reader_app.PRECISION_MAX_TIME} s).")
+        else:
+            print("Precision target off, M experiments are run.")
+
     def update_num_periods(self, event):
         """Updates the num_periods value in the SR400Device object."""
         try:
             new_num_periods = int(self.num_periods_entry.get())
-            if 1 <= new_num_periods <= 2000:
+            if new_num_periods >= 1:
                 self.sr400_device.num_periods = new_num_periods
                 print(f"Num_periods updated to: {new_num_periods}")
+                if new_num_periods > MAX_PERIODS:
+                    print(f"More than {MAX_PERIODS} periods: runs will be chained back to back.")
             else:
-                print("Invalid num_periods value. Enter a value between 1 and 2000.")
+                print("Invalid num_periods value. Enter a positive integer.")
         except ValueError:
             print("Invalid num_periods value. Please enter an integer.")
 
@@ -163,6 +156,7 @@ class MainApp:
         self.root.destroy()
 
 if __name__ == "__main__":
+    # Optional resource name, e.g. "prologix:COM5:23" to skip NI-VISA or "sim" for no hardware
     root = tk.Tk()
-    app = MainApp(root)
+    app = MainApp(root, sys.argv[1] if len(sys.argv) > 1 else None)
     root.mainloop()
\ No newline at end of file
@@ -8,6 +8,16 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from queue import Queue
 import numpy as np  # Import numpy
+from acquisition_engine import AcquisitionEngine
+from continuous import save_boundaries
+from online_stats import StreamStats
+from decimate import DecimatedSeries, minmax
+from waveform import WaveformAccumulator
+from blit_plot import BlitPlot
+from ui_bus import UiBus
+from instrument_scheduler import InstrumentScheduler
+from recorder import Recorder
+from run_catalog import RunCatalog
 
 class App:
     def __init__(self, root, data_source=None):
@@ -32,9 +42,19 @@ class App:
         self.UPDATE_INTERVAL = 0.1
         self.PLOT_UPDATE_INTERVAL = 0.1 # Unused now
         self.MAX_DATA_POINTS = 100
+        self.RATE_HALF_LIFE = 1.0 # s of counting time for the smoothed count rate
+        self.MONITOR_INTERVAL = 0.5 # s between QA/QB monitor polls
+        self.PRECISION_MAX_EXPERIMENTS = 1000 # Cap on M when a target precision is set
+        self.PRECISION_MAX_TIME = 600 # s, cap on a precision-targeted run
         self.num_experiments = 0
         # --- GUI elements ---
         self.create_widgets()
+        # Worker threads never touch Tk: they publish snapshots, the main loop shows the latest one per frame
+        self.ui = UiBus(self.root)
+        self.ui.subscribe("values", self.show_values)
+        self.ui.subscribe("plot", self.show_plot)
+        self.ui.subscribe("finished", lambda snapshot: self.stop_reading())
+        self.plot_width = 640 # Axes width in pixels, refreshed on the Tk thread
 
         # --- Initialization ---
         self.data_list = []
@@ -43,28 +63,34 @@ class App:
         self.qa_value = 0.0
         self.qb_value = 0.0
         self.x_value = 0.0  # Average of the *entire* experiment
-        self.times = []
-        self.a_values = []
-        self.b_values = []
-        self.x_values = [] # Now stores the average *per experiment*
-        self.qa_values = []
-        self.qb_values = []
-        self.experiment_averages = [] # To store averages for plotting
+        # Running statistics instead of growing lists: memory stays flat however long the run
+        self.run_stats = self.new_run_stats() # All periods since Start
+        self.experiment_stats = StreamStats("AB") # Periods of the current experiment
+        self.experiment_averages = DecimatedSeries(x0=1) # Averages per experiment, min/max pyramid for plotting
+        self.waveform = None # WaveformAccumulator: counts vs. period index averaged over the experiments
+        self.plot_mode = "averages" # or "waveform"
 
         self.start_time = 0  # Keep track of the *overall* start time
 
         self.is_recording = False
         self.start_record = False  # "Record on Start" flag
         self.recording_file = None
+        self.stop_threads = [] # Recorder.stop() running off the Tk thread, joined in on_closing
         self.reading = False
         self.last_plot_time = 0 # Unused now
         self.data_thread = None
-        self.qa_thread = None
-        self.qb_thread = None
-        self.sr400_lock = threading.Lock() # Lock for SR400 access
+        self.engine = None # AcquisitionEngine for device sources
+        self.scheduler = None # InstrumentScheduler: owns the SR400 link, serves QA/QB between acquisitions
+        self.monitor_commands = ["QA", "QB"]
+        self.monitor_delay = 0.0 # s the last QA/QB poll waited for the link
         self.qa_active = False
         self.qb_active = False
         self.is_between_experiments = False # Flag for experiment pause
+        self.streaming = True # Drain periods while counting if the device supports it
+        self.catalog = None # RunCatalog, opened on the first recording
+        self.target_precision = None # e.g. 0.01: stop once A's mean is known to 1 % (M is then ignored)
+        self.precision_method = "poisson" # or "empirical" (standard error of the periods)
+        self.ui.start()
 
         # --- Data Source Handling ---
         if isinstance(self.data_source, str):
@@ -84,8 +110,7 @@ class App:
             self.start_gui_update()  # Start the GUI update loop
             self.qa_active = True # QA/QB should run continuously
             self.qb_active = True
-            self.start_qa_update()
-            self.start_qb_update()
+            self.start_monitor()
         else:
             print("No data source provided.")
             self.start_button.config(state=tk.DISABLED)
@@ -105,12 +130,15 @@ class App:
         self.ax = self.fig.add_subplot(111)
         self.ax.set_facecolor("#333842")
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
         self.ax.set_title('Data', fontsize=16)
         self.ax.set_xlabel('Experiment Index')
         self.ax.set_ylabel('Average Value')
         self.ax.grid(True)
+        # One persistent line, updated in place and blitted (see update_plot)
+        self.average_line, = self.ax.plot([], [], marker='o', linestyle='-', color='green')
+        self.plotter = BlitPlot(self.canvas, self.ax, [self.average_line])
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
 
     def create_row_1(self):
         """Creates elements for the first row."""
@@ -210,6 +238,27 @@ class App:
                                              command=self.toggle_start_record)
         self.start_record_button.grid(row=0, column=3, padx=10, pady=5, sticky='w')
 
+        self.plot_mode_button = tk.Button(self.row3_frame, text="Plot: Averages",
+                                          bg="#565656", fg="white", font=self.FONT_STYLE,
+                                          command=self.toggle_plot_mode)
+        self.plot_mode_button.grid(row=1, column=3, padx=10, pady=5, sticky='w')
+
+    def toggle_plot_mode(self):
+        """Switches the plot between the experiment averages and the averaged waveform."""
+        if self.plot_mode == "averages":
+            self.plot_mode = "waveform"
+            self.plot_mode_button.config(text="Plot: Waveform")
+            self.ax.set_xlabel('Period Index')
+            self.ax.set_ylabel('Mean Counts')
+        else:
+            self.plot_mode = "averages"
+            self.plot_mode_button.config(text="Plot: Averages")
+            self.ax.set_xlabel('Experiment Index')
+            self.ax.set_ylabel('Average Value')
+        self.plotter.reset()
+        self.plotter.redraw()
+        self.update_plot()
+
     def check_file(self):
         """Checks if the file exists."""
         try:
@@ -276,8 +325,7 @@ class App:
             self.stop_button.config(state=tk.NORMAL)
             self.qa_active = True # QA/QB should run continuously
             self.qb_active = True
-            self.start_qa_update()
-            self.start_qb_update()
+            self.start_monitor()
 
             # Start recording if "Record on Start" is enabled
             if self.start_record and not self.is_recording:
@@ -295,13 +343,10 @@ class App:
                     self.start_realtime_reading()
                 else: # If reading from SR400
                     self.start_time = time.time()  # Record the *overall* start time
-                    self.experiment_averages = []  # Clear previous averages
-                    self.a_values = []
-                    self.b_values = []
-                    self.x_values = []
-                    self.data_thread = threading.Thread(target=self.read_data_from_device)
-                    self.data_thread.daemon = True
-                    self.data_thread.start()
+                    self.experiment_averages.clear()  # Clear previous averages
+                    self.plotter.reset()
+                    self.run_stats = self.new_run_stats()
+                    self.start_data_acquisition()
 
     def stop_reading(self):
         """Stops data reading."""
@@ -313,18 +358,20 @@ class App:
 
             if self.data_source and not isinstance(self.data_source, str):
                 # If using SR400, stop acquisition, but keep QA/QB running
-                self.data_source.stop_acquisition()
+                if self.engine:
+                    self.engine.stop()
+                else:
+                    self.data_source.stop_acquisition()
                 self.start_button.config(state=tk.NORMAL) # Re-enable Start
 
 
     def reset_data(self):
         """Resets all data and clears the plot."""
         self.data_queue.queue.clear()
-        self.times = []
-        self.a_values = []
-        self.b_values = []
-        self.x_values = []
-        self.experiment_averages = []
+        self.run_stats = self.new_run_stats()
+        self.experiment_stats = StreamStats("AB")
+        self.experiment_averages.clear()
+        self.plotter.reset()
         self.a_value = 0.0
         self.b_value = 0.0
         self.x_value = 0.0
@@ -332,6 +379,18 @@ class App:
         self.update_gui_values()
         self.update_plot()
 
+    def new_run_stats(self):
+        """Mean/variance/min/max, a 0-1000 counts histogram and the smoothed rate for channels A and B."""
+        return StreamStats("AB", histogram=(0, 1000, 100), half_life=self.RATE_HALF_LIFE)
+
+    def add_periods(self, data):
+        """Feeds rows of [A, B] counts into the experiment and run statistics."""
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim != 2 or not data.size:
+            return
+        self.experiment_stats.update(data)
+        self.run_stats.update(data, getattr(self.data_source, "period_time", None))
+
     def read_data_realtime(self):
         """Reads data from a file in real time (for file input)."""
         while True:
@@ -360,170 +419,140 @@ class App:
             time.sleep(self.UPDATE_INTERVAL)  # Regular update interval
 
     def start_data_acquisition(self):
-        """Starts data acquisition from the connected device (SR400)."""
-        if not self.data_thread or not self.data_thread.is_alive():
-            self.data_thread = threading.Thread(target=self.read_data_from_device)
-            self.data_thread.daemon = True
-            self.data_thread.start()
-
-    def read_data_from_device(self):
-        """Reads data from the connected SR400 device."""
-        while self.reading:
-            if self.data_source:
-                try:
-                    # Acquire data for *one* experiment
-                    data = self.data_source.acquire_data()
-                    self.current_experiment_num += 1
-
-                    if data:
-                        # Calculate the average of A and B *for this experiment*
-                        a_vals = [row[0] for row in data if len(row) > 0]
-                        b_vals = [row[1] for row in data if len(row) > 1]
-
-
-                        if a_vals :  # Avoid division by zero
-                           avg_a = sum(a_vals) / len(a_vals)
-                           self.a_values.append(avg_a) #for plot
-                           self.a_value = avg_a # for value show
-                        else:
-                            avg_a = 0.0
-                            self.a_values.append(0)
-
-
-                        if b_vals:
-                            avg_b = sum(b_vals) / len(b_vals)
-                            self.b_values.append(avg_b)
-                            self.b_value = avg_b
-                        else:
-                            avg_b = 0.0
-                            self.b_values.append(0)
-
-                        if a_vals or b_vals:
-                            self.x_value = avg_a # (avg_a + avg_b) / 2 # Use A value now.
-                            self.experiment_averages.append(self.x_value)
-                        else:
-                             self.x_value = 0.0
-                             self.experiment_averages.append(0)
-
-                        self.x_values.append(self.x_value) #for plot
-                        self.update_gui_values()
-                        self.update_plot()
-                        print(f"Experiment {self.current_experiment_num} completed: A={self.a_value:.1f}, B={self.b_value:.1f}, Avg={self.x_value:.1f}") # Print values to terminal
-
-                        # Put the raw data into the queue for processing (if needed)
-                        for row in data:
-                            self.data_queue.put(row)
-
-
-                    if self.current_experiment_num >= self.num_experiments:
-                        # All experiments completed
-                        print("All experiments completed.")
-                        print(f"Last Experiment: A={self.a_value:.1f}, B={self.b_value:.1f}, Avg={self.x_value:.1f}") # Print last values to terminal
-                        self.stop_reading()
-                         #Give a little time to draw the last graph
-                        time.sleep(0.1)
-
-                    else:
-                        # Pause *briefly* between experiments.  Crucially, set the flag.
-                        self.is_between_experiments = True
-                        time.sleep(0.1)  # Minimal pause.
-                        self.is_between_experiments = False
-
-
-                except Exception as e:
-                    print(f"Error reading data from device: {e}")
-            time.sleep(self.UPDATE_INTERVAL)
+        """Starts data acquisition from the connected device (SR400) through the engine."""
+        if self.engine and self.engine.thread and self.engine.thread.is_alive():
+            return
+        num_experiments = self.PRECISION_MAX_EXPERIMENTS if self.target_precision else self.num_experiments
+        self.engine = AcquisitionEngine(self.data_source, num_experiments, streaming=self.streaming,
+                                        scheduler=self.scheduler, target_precision=self.target_precision,
+                                        precision_method=self.precision_method,
+                                        max_time=self.PRECISION_MAX_TIME if self.target_precision else None)
+        self.waveform = WaveformAccumulator(self.data_source.num_periods, "A")
+        self.engine.subscribe(self.waveform.on_event) # before on_engine_event, so the plot sees this chunk
+        self.engine.subscribe(self.on_engine_event)
+        self.engine.start()
+
+    def on_engine_event(self, event):
+        """Handles acquisition engine events (called on the acquisition thread)."""
+        kind = event["kind"]
+        if kind == "start":
+            self.is_between_experiments = False
+            self.experiment_stats = StreamStats("AB")
+        elif kind == "chunk":
+            chunk = event["data"]
+            self.add_periods(chunk)
+            self.a_value, self.b_value = self.experiment_stats.mean("A"), self.experiment_stats.mean("B")
+            self.update_gui_values()
+            if self.plot_mode == "waveform":
+                self.update_plot()
+            for row in chunk:
+                self.data_queue.put(row)
+        elif kind == "experiment":
+            self.current_experiment_num = event["experiment"]
+            if not self.engine.streaming:
+                self.add_periods(event["data"])
+            self.a_value, self.b_value = event["avg_a"], event["avg_b"]
+            self.x_value = self.a_value # (avg_a + avg_b) / 2 # Use A value now.
+            self.experiment_averages.append(self.x_value)
+            self.update_gui_values()
+            self.update_plot()
+            a_stats = self.run_stats["A"]
+            rate = self.run_stats.rates["A"].rate or 0.0
+            print(f"Experiment {self.current_experiment_num} completed: A={self.a_value:.1f}, B={self.b_value:.1f}, Avg={self.x_value:.1f}, "
+                  f"run A={a_stats.mean:.1f}+-{a_stats.std:.1f} ({a_stats.count} periods), rate A={rate:.0f}/s"
+                  + (f", rel. error {event['rel_error']:.4f}" if event["rel_error"] is not None else "")) # Print values to terminal
+            if event["boundaries"] and self.is_recording and self.recording_file:
+                save_boundaries(self.recording_file.filename, self.current_experiment_num, event["boundaries"])
+            if not self.engine.streaming:
+                # Put the raw data into the queue for processing (streamed rows are already there)
+                for row in event["data"]:
+                    self.data_queue.put(row)
+            self.is_between_experiments = True # Pause between experiments, QA/QB may use the link
+        elif kind == "finished":
+            self.is_between_experiments = False
+            print("All experiments completed.")
+            if self.target_precision:
+                print(f"Target precision {self.target_precision} {'reached' if event['precision_reached'] else 'not reached'} "
+                      f"after {event['experiments']} experiments")
+            print(f"Last Experiment: A={self.a_value:.1f}, B={self.b_value:.1f}, Avg={self.x_value:.1f}") # Print last values to terminal
+            if self.scheduler:
+                report = self.scheduler.report()
+                print(f"QA/QB monitor: {report['polls']} polls, {report['coalesced']} coalesced, "
+                      f"delay mean {report['mean_delay']:.3f} s, max {report['max_delay']:.3f} s")
+            self.ui.publish("finished") # stop_reading() runs on the Tk thread
 
     def update_gui_values(self):
-        """Updates the displayed values in the GUI."""
-        self.A_value_label.config(text=f"{self.a_value:.1f}")
-        self.B_value_label.config(text=f"{self.b_value:.1f}")
-        self.QA_value_label.config(text=f"{self.qa_value:.1f}")
-        self.QB_value_label.config(text=f"{self.qb_value:.1f}")
-        self.x_value_label.config(text=f"{self.x_value:.1f}")
+        """Publishes the current values for display (safe from any thread)."""
+        self.ui.publish("values", (self.a_value, self.b_value, self.qa_value, self.qb_value, self.x_value))
+
+    def show_values(self, values):
+        """Updates the displayed values in the GUI (Tk thread)."""
+        a_value, b_value, qa_value, qb_value, x_value = values
+        self.A_value_label.config(text=f"{a_value:.1f}")
+        self.B_value_label.config(text=f"{b_value:.1f}")
+        self.QA_value_label.config(text=f"{qa_value:.1f}")
+        self.QB_value_label.config(text=f"{qb_value:.1f}")
+        self.x_value_label.config(text=f"{x_value:.1f}")
 
     def update_plot(self):
-        """Updates the plot with the experiment averages."""
-        self.ax.clear()
-        if self.experiment_averages:
-            indices = list(range(1,len(self.experiment_averages)+1))
-            self.ax.plot(indices, self.experiment_averages, marker='o', linestyle='-', color='green')
+        """Publishes the experiment averages or the averaged waveform for the plot (safe from any thread)."""
+        # Only about one point per pixel column of the axes, whatever the number of experiments/periods
+        if self.plot_mode == "waveform":
+            if self.waveform is None:
+                return
+            index, mean, sem = self.waveform.view("A")
+            self.ui.publish("plot", minmax(index, mean, int(self.plot_width)))
+        else:
+            self.ui.publish("plot", self.experiment_averages.view(pixels=self.plot_width))
 
-        self.ax.set_title('Data', fontsize=16)
-        self.ax.set_xlabel('Experiment Index')
-        self.ax.set_ylabel('Average Value')
-        self.ax.grid(True)
-        self.canvas.draw()
+    def show_plot(self, view):
+        """Redraws the plot line (Tk thread)."""
+        self.plot_width = self.ax.bbox.width
+        self.plotter.update([view])
 
 
     def process_data_queue(self):
         """Processes data from the queue (less critical now)."""
+        rows = []
         while not self.data_queue.empty():
             row = self.data_queue.get()
             # We don't use the individual data points for the main average anymore,
             # but we still process the queue for recording and other potential uses.
+            rows.append(row)
+        for row in rows[-10:]:
             numbers = list(map(float, row))
             formatted_data = " ".join(map(str, numbers))
             self.data_list.append(formatted_data)
             if len(self.data_list) > 10:
                 self.data_list.pop(0)
 
-            if self.is_recording:
-                timestamp = str(time.time())  # Use raw time for recording
-                with open(self.recording_file.name, "a") as rec_file:
-                    rec_file.write(f"{timestamp} - {formatted_data}\n")
+        if rows and self.is_recording and self.recording_file:
+            # The recorder formats and writes on its own thread
+            self.recording_file.write_rows(rows)
 
         # We no longer need to call update_plot here, as it's done per-experiment.
 
-    def update_qa_continuously(self):
-        """Continuously updates the QA value from the SR400."""
-        while True:
-            # Only update QA if we're NOT in the middle of an experiment
-            if self.data_source and self.qa_active and not self.is_between_experiments:
-                try:
-                    with self.sr400_lock:  # Acquire lock before SR400 access
-                        time.sleep(0.1)  # Short pause
-                        self.qa_value = float(self.data_source.query("QA").strip('\r\n'))
-                        time.sleep(0.2)
-                        self.update_gui_values() # Update after getting QA
-                except Exception as e:
-                    print(f"Error reading QA value: {e}")
-            else:
-                time.sleep(self.UPDATE_INTERVAL)
-                continue
-            time.sleep(self.UPDATE_INTERVAL)
-
-    def update_qb_continuously(self):
-        """Continuously updates the QB value from the SR400."""
-        while True:
-            # Only update QB if we're NOT in the middle of an experiment
-            if self.data_source and self.qb_active and not self.is_between_experiments:
-                try:
-                    with self.sr400_lock:
-                        time.sleep(0.1)
-                        self.qb_value = float(self.data_source.query("QB").strip('\r\n'))
-                        time.sleep(0.2)
-                        self.update_gui_values()
-                except Exception as e:
-                    print(f"Error reading QB value: {e}")
-            else:
-                time.sleep(self.UPDATE_INTERVAL)
-                continue
-            time.sleep(self.UPDATE_INTERVAL)
-
-    def start_qa_update(self):
-        """Starts a separate thread for updating the QA value."""
-        if not self.qa_thread or not self.qa_thread.is_alive():
-            self.qa_thread = threading.Thread(target=self.update_qa_continuously)
-            self.qa_thread.daemon = True
-            self.qa_thread.start()
-
-    def start_qb_update(self):
-        """Starts a separate thread for updating the QB value."""
-        if not self.qb_thread or not self.qb_thread.is_alive():
-            self.qb_thread = threading.Thread(target=self.update_qb_continuously)
-            self.qb_thread.daemon = True
-            self.qb_thread.start()
+    def start_monitor(self):
+        """Starts the scheduler that polls QA/QB whenever no acquisition holds the link."""
+        self.update_monitor_commands()
+        if self.scheduler is None:
+            self.scheduler = InstrumentScheduler(self.data_source, interval=self.MONITOR_INTERVAL,
+                                                 commands=self.monitor_commands, callback=self.on_monitor)
+        self.scheduler.commands = self.monitor_commands
+        self.scheduler.start()
+
+    def update_monitor_commands(self):
+        self.monitor_commands = [command for command, active in (("QA", self.qa_active), ("QB", self.qb_active))
+                                 if active]
+        if self.scheduler:
+            self.scheduler.commands = self.monitor_commands
+
+    def on_monitor(self, values, delay):
+        """QA/QB values from the scheduler (monitor thread); delay is how long the poll waited for the link."""
+        self.qa_value = values.get("QA", self.qa_value)
+        self.qb_value = values.get("QB", self.qb_value)
+        self.monitor_delay = delay
+        self.update_gui_values()
 
     def start_gui_update(self):
         """Starts the periodic GUI update loop."""
@@ -538,13 +567,25 @@ class App:
             self.is_recording = False
             self.record_button.config(text="Record")
             if self.recording_file:
-                self.recording_file.close()
+                # Drain, fsync and close off the Tk thread
+                self.stop_threads = [t for t in self.stop_threads if t.is_alive()]
+                thread = threading.Thread(target=self.recording_file.stop, daemon=True)
+                thread.start()
+                self.stop_threads.append(thread)
                 self.recording_file = None
         else:
             self.is_recording = True
             try:
-                filename = f"recorded_data_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                self.recording_file = open(filename, "w")
+                stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+                source = self.data_source
+                params = {"tset": getattr(source, "tset", None),
+                          "num_periods": getattr(source, "num_periods", None),
+                          "experiments": self.num_experiments,
+                          "disc_level": getattr(source, "disc_levels", {}).get("A")}
+                if self.catalog is None:
+                    self.catalog = RunCatalog() # runs.sqlite next to the recordings
+                self.recording_file = Recorder(f"recorded_data_{stamp}.txt", catalog=self.catalog,
+                                               params=params).start()
                 self.record_button.config(text="Stop Rec")
             except Exception as e:
                 print(f"Error creating file: {e}")
@@ -554,8 +595,17 @@ class App:
     def on_closing(self):
         """Handles application closing."""
         self.stop_reading()  # Stop any ongoing reading
+        self.ui.stop()
+        if self.scheduler:
+            self.scheduler.stop()
         if hasattr(self, 'data_file') and self.data_file:
             self.data_file.close()  # Close data file if open
+        if self.recording_file:
+            self.recording_file.stop() # Flush and fsync what was recorded
+            self.recording_file = None
+        for thread in self.stop_threads:
+            thread.join() # Recordings stopped earlier finish writing before exit
+        self.stop_threads = []
         self.qa_active = False
         self.qb_active = False
         self.root.destroy() # Destroy the Tkinter window
\ No newline at end of file
@@ -0,0 +1,252 @@
+#multi_acquisition.py
+import argparse
+import threading
+import time
+import numpy as np
+from continuous import MAX_PERIODS
+
+
+def bus_name(resource_name):
+    """Which bus a resource sits on: instruments on one bus take turns for transfers.
+
+    "prologix:COM5:23" -> "prologix:COM5", "GPIB0::23::INSTR" -> "GPIB0".
+    None for simulators, which are separate instruments even with the same
+    name and get a bus of their own; serial ports are their own bus.
+    """
+    if resource_name.startswith("prologix:"):
+        return ":".join(resource_name.split(":")[:2])
+    if resource_name.upper().startswith("GPIB"):
+        return resource_name.split("::")[0].upper()
+    if resource_name == "sim" or resource_name.startswith("sim:"):
+        return None
+    return resource_name
+
+
+class LockedResource:
+    """Wraps a device's resource so every single call holds the bus lock (an RLock, so longer transfers can hold it too)."""
+
+    def __init__(self, resource, lock):
+        self.resource = resource
+        self.lock = lock
+
+    def write(self, message):
+        with self.lock:
+            return self.resource.write(message)
+
+    def read(self):
+        with self.lock:
+            return self.resource.read()
+
+    def query(self, message):
+        with self.lock:
+            return self.resource.query(message)
+
+    def read_bytes(self, count, break_on_termchar=False):
+        with self.lock:
+            return self.resource.read_bytes(count, break_on_termchar=break_on_termchar)
+
+    @property
+    def bytes_in_buffer(self):
+        with self.lock:
+            return self.resource.bytes_in_buffer
+
+    def close(self):
+        with self.lock:
+            return self.resource.close()
+
+    def __getattr__(self, name):
+        # Anything else (expect, clear, timeout) is used by the driver with the bus already held
+        return getattr(self.resource, name)
+
+
+class Run:
+    """One experiment of one counter: counts plus the wall time its periods ended."""
+
+    def __init__(self, device_name, experiment, start_time, period_time, data):
+        self.device_name = device_name
+        self.experiment = experiment
+        self.start_time = start_time  # wall time of CS
+        self.period_time = period_time
+        self.data = data
+
+    @property
+    def times(self):
+        """Wall time at the end of each period."""
+        return self.start_time + self.period_time * np.arange(1, len(self.data) + 1)
+
+
+class MultiAcquisition:
+    """Runs M experiments on several SR400s at once, one thread per counter.
+
+    Counters only take turns for bus transfers (start, NN polls, buffer
+    dump): each of them counts on its own and restarts right after its
+    own dump, so while one is being read out the others keep counting.
+    Counters on different buses do not wait for each other at all. Every
+    run keeps its CS time, and align() puts the counters on one time axis.
+    callback(event) gets {"kind": "experiment", "run"} and {"kind": "finished"}
+    from the counter threads.
+    """
+
+    def __init__(self, devices, num_experiments=1, channel="A", callback=None):
+        self.devices = dict(devices)  # name -> SR400Device
+        self.num_experiments = num_experiments
+        self.channel = channel
+        self.callback = callback
+        self.locks = {}  # bus name (or device name for simulators) -> RLock
+        self.runs = {name: [] for name in self.devices}
+        self.bus_wait = {name: 0.0 for name in self.devices}  # s each counter spent waiting for its bus
+        self.threads = []
+        self.running = False
+        for name, device in self.devices.items():
+            if device.num_periods > MAX_PERIODS:
+                raise ValueError(f"{name}: at most {MAX_PERIODS} periods per run with several counters")
+            lock = self.locks.setdefault(bus_name(device.resource_name) or name, threading.RLock())
+            device.sr400 = LockedResource(device.sr400, lock)
+            device.bus_lock = lock
+
+    def publish(self, kind, **payload):
+        if self.callback is not None:
+            payload["kind"] = kind
+            try:
+                self.callback(payload)
+            except Exception as e:
+                print(f"Error in acquisition callback: {e}")
+
+    def hold_bus(self, name):
+        """Takes the counter's bus lock, adding the time spent waiting for it to bus_wait."""
+        lock = self.devices[name].bus_lock
+        started = time.perf_counter()
+        lock.acquire()
+        self.bus_wait[name] += time.perf_counter() - started
+        return lock
+
+    def run_device(self, name):
+        device = self.devices[name]
+        for experiment in range(1, self.num_experiments + 1):
+            if not self.running:
+                break
+            try:
+                lock = self.hold_bus(name)
+                try:
+                    device.start_counting()
+                finally:
+                    lock.release()
+                # NN polls lock per query, other counters use the bus between them
+                device.wait_for_completion(should_continue=lambda: self.running)
+                lock = self.hold_bus(name)
+                try:
+                    data = device.read_buffer(self.channel)
+                    device.sr400.write("CR\n")
+                finally:
+                    lock.release()
+            except Exception as e:
+                print(f"Error reading {name}: {e}")
+                continue
+            run = Run(name, experiment, device.last_start_time, device.period_time, data)
+            self.runs[name].append(run)
+            self.publish("experiment", run=run)
+
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self.run_device, args=(name,), daemon=True)
+                        for name in self.devices]
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+        self.running = False
+        self.publish("finished")
+
+    def run(self):
+        """Runs all counters and returns {name: [Run]}."""
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            self.join()
+        return self.runs
+
+    def stop(self):
+        self.running = False
+        for device in self.devices.values():
+            device.stop_acquisition()
+
+    def align(self, experiment):
+        """(times, {name: counts}) of one experiment on the period grid of the first counter.
+
+        Each counter's periods are matched to the nearest period of the
+        reference by their end times; periods outside the overlap are cut.
+        """
+        runs = {name: next((r for r in self.runs[name] if r.experiment == experiment), None)
+                for name in self.devices}
+        runs = {name: run for name, run in runs.items() if run is not None and len(run.data)}
+        if not runs:
+            return np.zeros(0), {}
+        reference = next(iter(runs.values()))
+        ref_times = reference.times
+        matched = {}
+        first, last = 0, len(ref_times)
+        offsets = {}
+        for name, run in runs.items():
+            offset = int(round((run.start_time - reference.start_time) / reference.period_time))
+            offsets[name] = offset
+            first = max(first, offset)
+            last = min(last, offset + len(run.data))
+        for name, run in runs.items():
+            matched[name] = run.data[first - offsets[name]:last - offsets[name]]
+        return ref_times[first:last], matched
+
+
+def main(argv=None):
+    """python multi_acquisition.py prologix:COM5:23 prologix:COM5:24 --tset 0.01 --periods 1000 -m 5"""
+    from sr400_device import SR400Device
+    from recorder import Recorder
+
+    parser = argparse.ArgumentParser(description="Concurrent acquisition on several SR400s.")
+    parser.add_argument("resources", nargs="+", help='e.g. "prologix:COM5:23" "prologix:COM5:24", or "sim" twice')
+    parser.add_argument("--tset", type=float, default=0.01)
+    parser.add_argument("--periods", type=int, default=1000)
+    parser.add_argument("-m", "--experiments", type=int, default=1)
+    parser.add_argument("--channel", default="A", choices=["A", "B"])
+    parser.add_argument("--output", help='write aligned rows "timestamp - counts per counter" to this file')
+    args = parser.parse_args(argv)
+
+    devices = {}
+    for index, resource in enumerate(args.resources):
+        device = SR400Device(resource)
+        device.tset = args.tset
+        device.num_periods = args.periods
+        devices[f"{index + 1}:{resource}"] = device
+    output = Recorder(args.output, mode="a").start() if args.output else None
+
+    def on_event(event):
+        if event["kind"] == "experiment":
+            run = event["run"]
+            print(f"{run.device_name} experiment {run.experiment}: {len(run.data)} periods, "
+                  f"mean {float(np.mean(run.data)) if len(run.data) else 0.0:.2f}")
+
+    manager = MultiAcquisition(devices, args.experiments, args.channel, callback=on_event)
+    started = time.time()
+    manager.run()
+    elapsed = time.time() - started
+    try:
+        for experiment in range(1, args.experiments + 1):
+            times, counts = manager.align(experiment)
+            if output and len(times):
+                columns = [np.asarray(counts[name]).reshape(len(times), -1)[:, 0] for name in devices]
+                for timestamp, row in zip(times, np.column_stack(columns)):
+                    output.write_rows([row], timestamp=float(timestamp))
+    finally:
+        if output:
+            output.stop()
+        for device in devices.values():
+            device.close()
+    print(f"{len(devices)} counters, {args.experiments} experiments in {elapsed:.1f} s; "
+          f"waiting for the bus: " + ", ".join(f"{name} {wait:.2f} s" for name, wait in manager.bus_wait.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#online_stats.py
+import math
+import numpy as np
+
+
+class ChannelStats:
+    """Count, mean, variance (Welford/Chan merge), min and max of one channel, fed in chunks."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.total = 0.0
+        self.last = None  # last value seen
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        n = values.size
+        if not n:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(np.square(values - chunk_mean).sum())
+        count = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / count
+        self.m2 += chunk_m2 + delta * delta * self.count * n / count
+        self.count = count
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.total += float(values.sum())
+        self.last = float(values[-1])
+
+    @property
+    def variance(self):
+        """Population variance (0.0 until there are values)."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def summary(self):
+        return {"count": self.count, "mean": self.mean, "variance": self.variance,
+                "min": self.min, "max": self.max, "total": self.total}
+
+
+class Histogram:
+    """Fixed-bin histogram; values outside [low, high) land in the under/overflow counters."""
+
+    def __init__(self, low=0.0, high=100.0, bins=100):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        low, high = self.edges[0], self.edges[-1]
+        self.underflow += int(np.count_nonzero(values < low))
+        self.overflow += int(np.count_nonzero(values >= high))
+        inside = values[(values >= low) & (values < high)]
+        index = ((inside - low) * (len(self.counts) / (high - low))).astype(np.int64)
+        self.counts += np.bincount(np.minimum(index, len(self.counts) - 1), minlength=len(self.counts))
+
+
+class EwmaRate:
+    """Exponentially weighted count rate (counts/s), half_life in seconds of counting time."""
+
+    def __init__(self, half_life=1.0):
+        self.half_life = half_life
+        self.rate = None
+
+    def update(self, counts, period):
+        """counts: per-period counts in order, period: counting time of one period (s)."""
+        counts = np.asarray(counts, dtype=np.float64).ravel()
+        if not counts.size or period <= 0:
+            return self.rate
+        decay = 0.5 ** (period / self.half_life)
+        rates = counts / period
+        if self.rate is None:
+            self.rate = float(rates[0])
+            rates = rates[1:]
+        # Closed form of rate = decay * rate + (1 - decay) * r over the chunk
+        weights = decay ** np.arange(rates.size - 1, -1, -1)
+        self.rate = float(self.rate * decay ** rates.size + (1 - decay) * np.dot(weights, rates))
+        return self.rate
+
+
+class StreamStats:
+    """ChannelStats per column of 2D chunks (rows = periods), plus optional histograms and rates."""
+
+    def __init__(self, channels="AB", histogram=None, half_life=None):
+        self.channels = channels
+        self.stats = {channel: ChannelStats() for channel in channels}
+        self.histograms = {channel: Histogram(*histogram) for channel in channels} if histogram else None
+        self.rates = {channel: EwmaRate(half_life) for channel in channels} if half_life else None
+
+    def update(self, rows, period=None):
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows[:, None]
+        for i, channel in enumerate(self.channels[:rows.shape[1]]):
+            column = rows[:, i]
+            self.stats[channel].update(column)
+            if self.histograms:
+                self.histograms[channel].update(column)
+            if self.rates and period:
+                self.rates[channel].update(column, period)
+
+    def __getitem__(self, channel):
+        return self.stats[channel]
+
+    def mean(self, channel="A"):
+        return self.stats[channel].mean
+
+    @property
+    def count(self):
+        return max((s.count for s in self.stats.values()), default=0)
+
+    def summary(self):
+        """{channel: stats dict} for the channels that got values."""
+        return {channel: s.summary() for channel, s in self.stats.items() if s.count}
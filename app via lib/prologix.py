@@ -0,0 +1,182 @@
+#prologix.py
+import time
+import serial
+
+ESCAPED = (b"\r", b"\n", b"\x1b", b"+")  # data bytes the adapter would otherwise eat
+
+_buses = {}  # port -> PrologixBus, so several GPIB addresses can share one adapter
+
+
+class PrologixBus:
+    """One adapter's serial port, shared by the transports of every instrument on its GPIB bus.
+
+    Remembers which address the adapter currently talks to, so a transport
+    only sends "++addr" when the bus changes hands. Callers must not mix
+    two instruments' transfers (multi_acquisition.py holds a lock per bus).
+    """
+
+    def __init__(self, port, baudrate=115200, timeout=5.0):
+        self.port = port
+        self.ser = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
+        self.address = None
+        self.users = 0
+        self.configured = False
+
+    def release(self):
+        self.users -= 1
+        if self.users <= 0:
+            self.ser.close()
+            _buses.pop(self.port, None)
+
+
+class PrologixTransport:
+    """Talks to a Prologix GPIB-USB adapter over its serial port, without NI-VISA.
+
+    Exposes the subset of the pyvisa resource API that SR400Device uses
+    (write, read, query, read_bytes, bytes_in_buffer, close), so it can be
+    passed in place of rm.open_resource(...). Auto-read stays off: every
+    read is an explicit "++read eoi", and buffer dumps keep READ_AHEAD of
+    them queued in the adapter so the transfer never waits on a round trip.
+    """
+    READ_AHEAD = 32  # "++read eoi" requests kept queued during a dump
+    READ_TMO_MS = 500  # adapter read timeout (++read_tmo_ms)
+
+    def __init__(self, port, gpib_address=23, baudrate=115200, timeout=5.0, bus=None):
+        self.port = port
+        self.gpib_address = gpib_address
+        self.timeout = timeout
+        self.bus = bus if bus is not None else PrologixBus(port, baudrate, timeout)
+        self.bus.users += 1
+        self.ser = self.bus.ser
+        self._requested = 0  # "++read eoi" sent but not answered yet
+        self._expected = None  # lines still to come of the current dump, None if unknown
+        self._last_activity = time.time()
+        self.setup()
+
+    def setup(self):
+        """Puts the adapter in controller mode (once per bus) and addresses the instrument."""
+        if not self.bus.configured:
+            for command in ("++mode 1", "++auto 0", "++eoi 1", "++eos 2", f"++read_tmo_ms {self.READ_TMO_MS}"):
+                self.adapter_command(command)
+            self.bus.configured = True
+        self.select()
+        self.ser.reset_input_buffer()
+
+    def select(self):
+        """Points the adapter at this instrument if another one on the bus was addressed last."""
+        if self.bus.address != self.gpib_address:
+            self.adapter_command(f"++addr {self.gpib_address}")
+            self.bus.address = self.gpib_address
+            self._requested = 0  # read requests queued for the previous address do not count for us
+
+    def adapter_command(self, command):
+        """Sends a ++ command to the adapter itself."""
+        self.ser.write(f"{command}\n".encode("ascii"))
+
+    def write(self, message):
+        """Sends a message to the instrument; ++eos appends the terminator."""
+        self.select()
+        data = message.rstrip("\r\n").encode("ascii")
+        for char in ESCAPED:
+            data = data.replace(char, b"\x1b" + char)
+        self.ser.write(data + b"\n")
+        # Reads still queued are served before the instrument gets this message, none of them can carry its answer
+        self._requested = 0
+        self._expected = None
+
+    def read(self):
+        """Reads one response line from the instrument."""
+        self.select()
+        self._expire_requests()
+        if not self._requested:
+            self._request(1)
+        line = self.ser.readline()
+        if not line and self._requested:
+            # The reads we counted on were gone after all: ask once more
+            self._requested = 0
+            self._request(1)
+            line = self.ser.readline()
+        if line:
+            self._received(line)
+        return line.decode("ascii", errors="ignore")
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    @property
+    def bytes_in_buffer(self):
+        """Bytes already waiting on the serial port; queues more reads if none are pending."""
+        waiting = self.ser.in_waiting
+        if not waiting:
+            self._request_ahead()
+        return waiting
+
+    def read_bytes(self, count, break_on_termchar=False):
+        """Reads up to count bytes as they arrive, keeping reads queued in the adapter."""
+        buf = bytearray()
+        deadline = time.time() + self.timeout
+        while len(buf) < count and time.time() < deadline:
+            waiting = self.ser.in_waiting
+            if not waiting:
+                self._request_ahead()
+                waiting = 1  # block for the next byte (up to the serial timeout)
+            chunk = self.ser.read(min(waiting, count - len(buf)))
+            if not chunk:
+                continue
+            buf += chunk
+            self._received(chunk)
+            if break_on_termchar and buf.endswith(b"\n"):
+                break
+        return bytes(buf)
+
+    def expect(self, lines):
+        """Caps the read-ahead at the lines a dump still has to send, so no requests are left over after it."""
+        self._expected = lines
+
+    def _request(self, count):
+        self.select()
+        self.ser.write(b"++read eoi\n" * count)
+        self._requested += count
+        self._last_activity = time.time()
+
+    def _expire_requests(self):
+        """Forgets requests the adapter gave up on: with nothing to send, each one ends after READ_TMO_MS."""
+        if self._requested:
+            expired = int((time.time() - self._last_activity) * 1000.0 / self.READ_TMO_MS)
+            self._requested = max(self._requested - expired, 0)
+
+    def _request_ahead(self):
+        self._expire_requests()
+        wanted = self.READ_AHEAD if self._expected is None else min(self.READ_AHEAD, self._expected)
+        if self._requested < max(wanted // 2, 1) and self._requested < wanted:
+            self._request(wanted - self._requested)
+
+    def _received(self, data):
+        lines = data.count(b"\n")
+        self._requested = max(self._requested - lines, 0)
+        if self._expected is not None:
+            self._expected = max(self._expected - lines, 0)
+        self._last_activity = time.time()
+
+    def clear(self):
+        """Drops unanswered read requests and whatever is left in the input buffer."""
+        self._requested = 0
+        self.ser.reset_input_buffer()
+
+    def close(self):
+        self.bus.release()
+
+
+def open_prologix(resource_name, timeout=5.0):
+    """Opens a "prologix:PORT[:ADDR]" resource name, e.g. "prologix:COM5:23".
+
+    Instruments on the same port share one PrologixBus, e.g. "prologix:COM5:23"
+    and "prologix:COM5:24" for two counters on one adapter.
+    """
+    parts = resource_name.split(":")
+    gpib_address = int(parts[2]) if len(parts) > 2 else 23
+    bus = _buses.get(parts[1])
+    if bus is None:
+        bus = _buses[parts[1]] = PrologixBus(parts[1], timeout=timeout)
+    return PrologixTransport(parts[1], gpib_address=gpib_address, timeout=timeout, bus=bus)
@@ -0,0 +1,116 @@
+#prologix_sim.py
+import os
+import select
+import threading
+import time
+import tty
+from sr400_sim import SimulatedSR400
+
+
+class PrologixEmulator:
+    """Stands in for a Prologix GPIB-USB adapter on a pseudo-terminal (Linux/macOS).
+
+    `port` is the pty device to open, e.g. PrologixTransport(emulator.port)
+    or SR400Device(f"prologix:{emulator.port}:23"). Lines starting with
+    "++" are adapter commands (++addr, ++read eoi, ++read_tmo_ms; the rest
+    are accepted and ignored), anything else is unescaped and written to
+    the addressed instrument. Every "++read eoi" answers one line, or
+    nothing after read_tmo_ms - like the adapter, requests are served one
+    at a time in the order they came. Instruments are SimulatedSR400s by
+    GPIB address.
+    """
+
+    def __init__(self, instruments=None):
+        if instruments is None:
+            instruments = {23: SimulatedSR400()}
+        self.instruments = dict(instruments)
+        self.address = next(iter(self.instruments))
+        self.read_tmo_ms = 1200
+        self.commands = []  # every line handled so far, for tests
+        self.processed = threading.Condition()  # notified after each line is handled
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.running = False
+        self.thread.join(1.0)
+        os.close(self.master)
+        os.close(self.slave)
+
+    def wait_for(self, line, timeout=2.0):
+        """Blocks until `line` (bytes) has been handled; False on timeout."""
+        with self.processed:
+            return self.processed.wait_for(lambda: line in self.commands, timeout)
+
+    def run(self):
+        for line, adapter in self.lines():
+            try:
+                if adapter:
+                    self.adapter_command(line)
+                elif self.address in self.instruments:
+                    self.instruments[self.address].write(line.decode("ascii"))
+            except Exception as e:
+                print(f"PrologixEmulator: {line!r}: {e}")
+            with self.processed:
+                self.commands.append(line)
+                self.processed.notify_all()
+
+    def lines(self):
+        """Yields (line, is adapter command) with the escapes removed."""
+        line = bytearray()
+        escaped_start = False
+        escape = False
+        while self.running:
+            if not select.select([self.master], [], [], 0.05)[0]:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            for byte in data:
+                char = bytes([byte])
+                if escape:
+                    line += char
+                    escape = False
+                    escaped_start = escaped_start or len(line) == 1
+                elif char == b"\x1b":
+                    escape = True
+                elif char in (b"\n", b"\r"):
+                    if line:
+                        yield bytes(line), line.startswith(b"++") and not escaped_start
+                    line = bytearray()
+                    escaped_start = False
+                else:
+                    line += char
+
+    def adapter_command(self, line):
+        words = line.decode("ascii").split()
+        name, args = words[0], words[1:]
+        if name == "++addr" and args:
+            self.address = int(args[0])
+        elif name == "++read_tmo_ms" and args:
+            self.read_tmo_ms = int(args[0])
+        elif name == "++read":
+            self.answer_read()
+
+    def answer_read(self):
+        """Sends the addressed instrument's next line, waiting up to read_tmo_ms for it."""
+        instrument = self.instruments.get(self.address)
+        if instrument is None:
+            return
+        deadline = time.time() + self.read_tmo_ms / 1000.0
+        while time.time() < deadline:
+            with instrument.lock:
+                queued = bool(instrument._out)
+            if queued:
+                instrument.timeout = max(deadline - time.time(), 0.001)
+                try:
+                    os.write(self.master, instrument.read().encode("ascii"))
+                except TimeoutError:
+                    pass
+                return
+            time.sleep(0.001)
@@ -0,0 +1,101 @@
+#recorder.py
+import os
+import threading
+import time
+from queue import Queue, Empty
+from online_stats import StreamStats
+
+
+class Recorder:
+    """Writes "timestamp - values" rows to one open file from a background thread.
+
+    write_rows() only queues the rows, so the caller (the Tk main loop or
+    the acquisition thread) never touches the disk. The writer thread
+    formats whole batches, flushes once flush_bytes are pending or
+    flush_interval seconds have passed, and stop() fsyncs before closing.
+    """
+
+    def __init__(self, filename, mode="w", flush_bytes=1 << 16, flush_interval=1.0, buffer_size=1 << 20,
+                 catalog=None, params=None):
+        self.filename = filename
+        self.catalog = catalog  # RunCatalog to register the file in on stop()
+        self.params = params or {}  # tset, num_periods, experiments, disc_level for the catalog
+        self.totals = StreamStats("ABT")
+        self.start_time = time.time()
+        self.mode = mode
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.queue = Queue()
+        self.file = None
+        self.thread = None
+        self.rows_written = 0
+
+    @property
+    def name(self):
+        return self.filename
+
+    def start(self):
+        """Opens the file and starts the writer thread."""
+        self.file = open(self.filename, self.mode, buffering=self.buffer_size)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def write_rows(self, rows, timestamp=None):
+        """Queues rows (sequences of numbers); they all get the same timestamp."""
+        if timestamp is None:
+            timestamp = time.time()
+        self.queue.put((timestamp, rows))
+
+    def stop(self):
+        """Writes everything queued, fsyncs and closes the file."""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if self.catalog is not None:
+            try:
+                self.catalog.register(self.filename, self.totals.summary(), created=self.start_time,
+                                      format="txt", **self.params)
+            except Exception as e:
+                print(f"Error registering {self.filename} in the run catalog: {e}")
+
+    def _run(self):
+        pending = 0
+        last_flush = time.time()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                pending += self._write(*item)
+                # Take whatever else is queued in the same pass
+                while not self.queue.empty():
+                    item = self.queue.get()
+                    if item is None:
+                        return
+                    pending += self._write(*item)
+            if pending and (pending >= self.flush_bytes or time.time() - last_flush >= self.flush_interval):
+                self.file.flush()
+                pending = 0
+                last_flush = time.time()
+
+    def _write(self, timestamp, rows):
+        prefix = f"{timestamp} - "
+        block = "".join(f"{prefix}{' '.join(str(float(v)) for v in row)}\n" for row in rows)
+        self.file.write(block)
+        self.rows_written += len(rows)
+        if self.catalog is not None:
+            try:
+                self.totals.update(rows)
+            except ValueError:
+                pass  # non-numeric rows are still recorded, just not summarized
+        return len(block)
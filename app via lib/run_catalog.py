@@ -0,0 +1,149 @@
+#run_catalog.py
+import datetime
+import os
+import re
+import sqlite3
+import time
+from online_stats import StreamStats
+
+DEFAULT_DB = "runs.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    created REAL NOT NULL,
+    format TEXT,
+    tset REAL,
+    num_periods INTEGER,
+    experiments INTEGER,
+    disc_level REAL,
+    channels TEXT
+);
+CREATE TABLE IF NOT EXISTS run_stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    channel TEXT NOT NULL,
+    count INTEGER,
+    mean REAL,
+    variance REAL,
+    min REAL,
+    max REAL,
+    total REAL,
+    PRIMARY KEY (run_id, channel)
+);
+CREATE INDEX IF NOT EXISTS runs_disc_level ON runs(disc_level);
+CREATE INDEX IF NOT EXISTS runs_created ON runs(created);
+CREATE INDEX IF NOT EXISTS run_stats_channel_mean ON run_stats(channel, mean);
+"""
+
+
+class RunCatalog:
+    """SQLite index of recorded runs: parameters plus per-channel summary statistics.
+
+    Every call opens its own short connection, so recorders can register
+    from their writer threads.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        with self.connect() as db:
+            db.executescript(SCHEMA)
+
+    def connect(self):
+        db = sqlite3.connect(self.path)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys = ON")
+        return db
+
+    def register(self, path, stats, created=None, format=None, tset=None, num_periods=None, experiments=None,
+                 disc_level=None, channels=None):
+        """Adds or replaces a run; stats is {channel: {count, mean, variance, min, max, total}}."""
+        path = os.path.abspath(path)
+        if created is None:
+            created = time.time()
+        if channels is None:
+            channels = "".join(stats)
+        with self.connect() as db:
+            db.execute("DELETE FROM runs WHERE path = ?", (path,))
+            run_id = db.execute(
+                "INSERT INTO runs (path, created, format, tset, num_periods, experiments, disc_level, channels) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, created, format, tset, num_periods, experiments, disc_level, channels)).lastrowid
+            db.executemany(
+                "INSERT INTO run_stats (run_id, channel, count, mean, variance, min, max, total) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, channel, s["count"], s["mean"], s["variance"], s["min"], s["max"], s["total"])
+                 for channel, s in stats.items()])
+        return run_id
+
+    def register_file(self, path, **params):
+        """Indexes an existing .sr4 or text recording (parameters from its header or file name).
+
+        Text files carry no settings; params (tset, num_periods, experiments,
+        disc_level) fill in what the caller knows.
+        """
+        if path.endswith(".sr4"):
+            from runfile import open_run
+            header, counts = open_run(path)
+            totals = StreamStats(header["channels"] or "A")
+            totals.update(counts)
+            return self.register(path, totals.summary(), created=header["start_time"],
+                                 format="sr4", tset=header["tset"], num_periods=header["num_periods"],
+                                 experiments=header["experiments"], disc_level=header["disc_level"],
+                                 channels=header["channels"])
+        from text_loader import load_text
+        timestamps, values = load_text(path)
+        totals = StreamStats("ABT")
+        totals.update(values)
+        created, disc_level = params_from_name(path)
+        if created is None:
+            created = float(timestamps[0]) if len(timestamps) else os.path.getmtime(path)
+        if params.get("disc_level") is None:
+            params["disc_level"] = disc_level
+        return self.register(path, totals.summary(), created=created, format="txt", **params)
+
+    def query(self, channel="A", disc_level=None, since=None, until=None, min_mean=None, max_mean=None):
+        """Runs with their stats for one channel, e.g. query(disc_level=0.25, since=week_ago, min_mean=10)."""
+        sql = ("SELECT runs.*, run_stats.channel, run_stats.count, run_stats.mean, run_stats.variance, "
+               "run_stats.min, run_stats.max, run_stats.total "
+               "FROM runs JOIN run_stats ON run_stats.run_id = runs.id WHERE run_stats.channel = ?")
+        args = [channel]
+        for clause, value in (("runs.disc_level = ?", disc_level), ("runs.created >= ?", since),
+                              ("runs.created < ?", until), ("run_stats.mean > ?", min_mean),
+                              ("run_stats.mean < ?", max_mean)):
+            if value is not None:
+                sql += f" AND {clause}"
+                args.append(value)
+        with self.connect() as db:
+            return [dict(row) for row in db.execute(sql + " ORDER BY runs.created", args)]
+
+    def discriminator_curve(self, channel="A", since=None, until=None):
+        """[(disc_level, mean of run means, runs)] ordered by level - the voltage-set graph as one query."""
+        sql = ("SELECT runs.disc_level, AVG(run_stats.mean), COUNT(*) FROM runs "
+               "JOIN run_stats ON run_stats.run_id = runs.id "
+               "WHERE run_stats.channel = ? AND runs.disc_level IS NOT NULL")
+        args = [channel]
+        if since is not None:
+            sql += " AND runs.created >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND runs.created < ?"
+            args.append(until)
+        with self.connect() as db:
+            return [tuple(row) for row in db.execute(sql + " GROUP BY runs.disc_level ORDER BY runs.disc_level",
+                                                     args)]
+
+
+def params_from_name(path):
+    """(created, disc_level in V) from "recorded_data_YYYYmmdd_HHMMSS.txt", "+250.txt" (mV) or "+212500uV.txt" names."""
+    name = os.path.basename(path)
+    match = re.search(r"(\d{8}_\d{6})", name)
+    created = None
+    if match:
+        created = datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+    match = re.match(r"([+-]\d+)(?:\.\d+)?\.txt$", name)
+    disc_level = int(match.group(1)) / 1000.0 if match else None
+    match = re.match(r"([+-]\d+)uV\.txt$", name)  # dl_sweep.py levels finer than 1 mV
+    if match:
+        disc_level = int(match.group(1)) / 1e6
+    return created, disc_level
@@ -0,0 +1,148 @@
+#runfile.py
+import os
+import struct
+import time
+import numpy as np
+from online_stats import StreamStats
+
+MAGIC = b"SR400RUN"
+VERSION = 1
+# magic, version, header size, channels, start time, tset, num_periods, M, discriminator level
+# (V, NaN when the level is unknown, e.g. DL was never set through the driver)
+HEADER_FORMAT = "<8sHH4sdd II d"
+HEADER_SIZE = 64
+COUNT_DTYPE = np.dtype("<u4")
+
+
+def pack_header(tset, num_periods, experiments, disc_level, channels, start_time):
+    if disc_level is None:
+        disc_level = float("nan")
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, HEADER_SIZE, channels.encode("ascii")[:4].ljust(4, b"\0"),
+                         start_time, tset, num_periods, experiments, disc_level)
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def read_header(path):
+    """Returns the header of a .sr4 run file as a dict."""
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or not raw.startswith(MAGIC):
+        raise ValueError(f"{path} is not an SR400 run file")
+    size = struct.calcsize(HEADER_FORMAT)
+    magic, version, header_size, channels, start_time, tset, num_periods, experiments, disc_level = \
+        struct.unpack(HEADER_FORMAT, raw[:size])
+    return {
+        "version": version,
+        "header_size": header_size,
+        "channels": channels.rstrip(b"\0").decode("ascii"),
+        "start_time": start_time,
+        "tset": tset,
+        "num_periods": num_periods,
+        "experiments": experiments,
+        "disc_level": None if disc_level != disc_level else disc_level,  # NaN: unknown
+    }
+
+
+def open_run(path):
+    """Maps a run file without copying: returns (header, counts) with counts shaped (periods, channels).
+
+    The map covers what is on disk at call time, so a file that is still
+    being appended to can be opened again later to see the new rows.
+    """
+    header = read_header(path)
+    width = max(len(header["channels"]), 1)
+    data_bytes = os.path.getsize(path) - header["header_size"]
+    rows = data_bytes // (COUNT_DTYPE.itemsize * width)
+    if rows == 0:
+        return header, np.zeros((0, width), dtype=COUNT_DTYPE)
+    counts = np.memmap(path, dtype=COUNT_DTYPE, mode="r", offset=header["header_size"], shape=(rows, width))
+    return header, counts
+
+
+class RunWriter:
+    """Append-only writer for .sr4 run files: a 64-byte header, then uint32 counts per channel.
+
+    Has the same write_rows()/stop() interface as recorder.Recorder. When
+    channels is None the header is written on the first write_rows(), with
+    one channel letter per column ("A", "AB", "ABT"). disc_level=None
+    (unknown) is stored as NaN and registered in the catalog as NULL.
+    """
+
+    def __init__(self, filename, tset=0.0, num_periods=0, experiments=0, disc_level=None, channels=None,
+                 start_time=None, catalog=None):
+        self.filename = filename
+        self.catalog = catalog  # RunCatalog to register the run in on stop()
+        self.totals = None
+        self.tset = tset
+        self.num_periods = num_periods
+        self.experiments = experiments
+        self.disc_level = disc_level
+        self.channels = channels
+        self.start_time = time.time() if start_time is None else start_time
+        self.file = open(filename, "wb")
+        self.rows_written = 0
+        if channels is not None:
+            self._write_header()
+
+    @property
+    def name(self):
+        return self.filename
+
+    def start(self):
+        return self
+
+    def _write_header(self):
+        self.file.write(pack_header(self.tset, self.num_periods, self.experiments, self.disc_level,
+                                    self.channels, self.start_time))
+
+    def write_rows(self, rows, timestamp=None):
+        """Appends rows of counts; every row must have one value per channel."""
+        counts = np.asarray(rows, dtype=np.float64)
+        if counts.ndim == 1:
+            counts = counts[:, None]
+        if self.channels is None:
+            self.channels = "ABT"[:counts.shape[1]]
+            self._write_header()
+        if counts.shape[1] != len(self.channels):
+            raise ValueError(f"Expected {len(self.channels)} columns, got {counts.shape[1]}")
+        self.file.write(np.ascontiguousarray(counts, dtype=COUNT_DTYPE).tobytes())
+        self.rows_written += len(counts)
+        if self.totals is None:
+            self.totals = StreamStats(self.channels)
+        self.totals.update(counts)
+
+    def flush(self):
+        self.file.flush()
+
+    def stop(self):
+        """Writes the header if nothing was recorded, fsyncs and closes.
+
+        Otherwise the header is written again in place, so settings known
+        only at the end (experiments actually run in precision mode) are kept.
+        """
+        if self.file.closed:
+            return
+        if self.channels is None:
+            self.channels = "A"
+        else:
+            self.file.seek(0)
+        self._write_header()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if self.catalog is not None:
+            try:
+                self.catalog.register(self.filename, self.totals.summary() if self.totals else {}, created=self.start_time,
+                                      format="sr4", tset=self.tset, num_periods=self.num_periods,
+                                      experiments=self.experiments, disc_level=self.disc_level,
+                                      channels=self.channels)
+            except Exception as e:
+                print(f"Error registering {self.filename} in the run catalog: {e}")
+
+    close = stop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
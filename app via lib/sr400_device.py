@@ -0,0 +1,386 @@
+#sr400_device.py
+import time
+import warnings
+from contextlib import contextmanager
+import numpy as np
+from continuous import ContinuousAcquisition, MAX_PERIODS
+
+
+def parse_dump(raw, num_lines=None):
+    """Parses a raw EA/EB dump ("a[,b]" per line) into a 2D int array in one step.
+
+    Lines that do not parse (a garbled byte, a missing column) are dropped
+    whole, so the remaining rows keep their columns.
+    """
+    text = raw.decode("ascii", errors="ignore") if isinstance(raw, (bytes, bytearray)) else raw
+    lines = text.split()
+    if not lines:
+        return np.empty((0, 1), dtype=np.int64)
+    num_cols = lines[0].count(",") + 1
+    rows = None
+    if text.count(",") == len(lines) * (num_cols - 1):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)  # older NumPy warns and stops early instead
+                values = np.fromstring(text.replace(",", " "), dtype=np.int64, sep=" ")
+        except ValueError:
+            values = None  # a non-numeric byte somewhere
+        if values is not None and values.size == len(lines) * num_cols:
+            rows = values.reshape(-1, num_cols)
+    if rows is None:
+        rows = _parse_dump_lines(lines)
+    if num_lines is not None:
+        rows = rows[:num_lines]
+    return rows
+
+
+def _parse_dump_lines(lines):
+    """Slow path of parse_dump: line by line, keeping the lines with the usual number of columns."""
+    widths = [line.count(",") + 1 for line in lines]
+    num_cols = max(set(widths), key=widths.count)
+    rows = []
+    for line, width in zip(lines, widths):
+        if width != num_cols:
+            continue
+        try:
+            rows.append([int(value) for value in line.split(",")])
+        except ValueError:
+            continue
+    if not rows:
+        return np.empty((0, num_cols), dtype=np.int64)
+    return np.array(rows, dtype=np.int64)
+
+
+class SR400Device:
+    DUMP_CHUNK_SIZE = 4096  # bytes per raw read during a buffer dump
+    MAX_LINE_BYTES = 24  # upper bound for one "count[,count]\r\n" line
+    POLL_MIN = 0.005  # s, shortest NN polling interval
+    POLL_MAX = 0.5  # s, longest NN polling interval
+    MAX_BATCH_CHARS = 200  # keep one batched line well inside the SR400 input buffer
+
+    def __init__(self, resource_name):
+        self.resource_name = resource_name
+        self.rm = None
+        self.sr400 = self.open_resource(resource_name)
+        self.state = {}  # last value written per setting, mirrors the instrument
+        self.disc_levels = {}  # V per channel, as last set with set_discriminator
+        self._batch = None  # commands queued by batch(), None when not batching
+        self.last_batch = None  # (commands, link writes, seconds) of the last flushed batch, see benchmark_acquisition.py
+        self.tset = 0.001
+        self.dwell = 0.002  # s between periods, the SR400 default dwell (DT)
+        self.num_periods = 2000
+        self.bulk_dump = True  # False falls back to one read() per period
+        self.last_start_time = None  # wall time of the last CS
+        self.continuous = None  # last ContinuousAcquisition, for its dead-time annotations
+
+    @property
+    def period_time(self):
+        """Wall time of one period: preset plus dwell."""
+        return self.tset + self.dwell
+
+    def open_resource(self, resource_name):
+        """Opens "prologix:PORT[:ADDR]" natively, "sim[:RATE_A[:RATE_B]]" as a simulator, anything else through pyvisa."""
+        if resource_name.startswith("prologix:"):
+            from prologix import open_prologix
+            return open_prologix(resource_name)
+        if resource_name == "sim" or resource_name.startswith("sim:"):
+            from sr400_sim import open_simulator
+            return open_simulator(resource_name)
+        if self.rm is None:
+            import pyvisa
+            self.rm = pyvisa.ResourceManager()
+        return self.rm.open_resource(resource_name)
+
+    def acquire_data(self):
+        """Acquires data from the SR400."""
+        if self.num_periods > MAX_PERIODS:
+            self.continuous = ContinuousAcquisition(self, self.num_periods)
+            return self.continuous.run()
+        self.continuous = None
+        try:
+            self.start_counting()
+            if not self.wait_for_completion():
+                print("Counting did not finish in time, dumping what is there")
+
+            fa = self.read_buffer("A")
+            self.sr400.write("CR\n")
+            return fa
+        except Exception as e:
+            print(f"Error acquiring data: {e}")
+            return None
+
+    def start_counting(self, num_periods=None):
+        """Writes the preset and NP, resets and starts a new N-period run."""
+        if num_periods is None:
+            num_periods = self.num_periods
+        with self.batch():
+            if self.set_param("CP2", f"CP2, {self.tset * 10 ** 7 + 1}"):  # Set preset
+                print(f"установлен tset: {self.tset}")
+            self.set_param("NP", f"NP {num_periods}")  # Set number of periods
+            self.write_command("CR")
+            self.write_command("CS")
+        self.last_start_time = time.time()
+
+    def set_param(self, key, command):
+        """Writes a setting command only if it differs from the cached state; True if written."""
+        if self.state.get(key) == command:
+            return False
+        self.write_command(command)
+        self.state[key] = command
+        return True
+
+    def write_command(self, command):
+        """Sends one command, or queues it if a batch() is open."""
+        if self._batch is not None:
+            self._batch.append(command)
+        else:
+            self.sr400.write(f"{command}\n")
+
+    @contextmanager
+    def batch(self):
+        """Collects the commands written inside the block and sends them as ';'-joined lines."""
+        if self._batch is not None:  # already batching, join the outer batch
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            commands, self._batch = self._batch, None
+            self.flush_batch(commands)
+
+    def flush_batch(self, commands):
+        """Writes the commands in as few lines as MAX_BATCH_CHARS allows."""
+        if not commands:
+            return
+        started = time.perf_counter()
+        lines = []
+        line = ""
+        for command in commands:
+            if line and len(line) + len(command) + 1 > self.MAX_BATCH_CHARS:
+                lines.append(line)
+                line = command
+            else:
+                line = f"{line};{command}" if line else command
+        lines.append(line)
+        try:
+            for line in lines:
+                self.sr400.write(f"{line}\n")
+        except Exception:
+            self.invalidate_state()  # unknown which settings made it through
+            raise
+        self.last_batch = (len(commands), len(lines), time.perf_counter() - started)
+
+    def query_many(self, commands):
+        """Sends several queries in one line and reads the answers back to back, no sleeps."""
+        self.sr400.write(";".join(commands) + "\n")
+        return [self.sr400.read().strip() for _ in commands]
+
+    def set_discriminator(self, channel, level):
+        """Sets the discriminator level (V) of counter A/B/T (DL)."""
+        index = "ABT".index(channel)
+        self.set_param(f"DL{index}", f"DL {index},{level}")
+        self.disc_levels[channel] = level
+
+    def set_gate_mode(self, channel, mode):
+        """Sets the gate mode of counter A/B: 0 CW, 1 FIXED, 2 SCAN (GM)."""
+        index = "AB".index(channel)
+        self.set_param(f"GM{index}", f"GM {index},{mode}")
+
+    def invalidate_state(self):
+        """Forgets the cached settings, so the next set_param writes again."""
+        self.state = {}
+
+    def reset(self):
+        """Resets the SR400 to its defaults (CL) and drops the cached settings."""
+        self.sr400.write("CL\n")
+        self.invalidate_state()
+
+    def reconnect(self):
+        """Reopens the resource; the instrument may have been changed meanwhile."""
+        try:
+            self.sr400.close()
+        except Exception as e:
+            print(f"Error closing SR400: {e}")
+        self.sr400 = self.open_resource(self.resource_name)
+        self.invalidate_state()
+
+    def stream_data(self, channel="A", should_continue=None):
+        """Yields int arrays of completed periods; chains runs if num_periods > MAX_PERIODS."""
+        if self.num_periods > MAX_PERIODS:
+            self.continuous = ContinuousAcquisition(self, self.num_periods, channel)
+            yield from self.continuous.chunks(should_continue)
+        else:
+            self.continuous = None
+            yield from self.stream_run(self.num_periods, channel, should_continue)
+
+    def stream_run(self, num_periods, channel="A", should_continue=None, timeout=None):
+        """Starts one run and yields int arrays of the periods completed so far while counting.
+
+        EA/EB is issued right after CS; the SR400 sends each buffer point as
+        its period completes, so the finished periods are drained in chunks
+        instead of waiting for the whole run.
+        """
+        if timeout is None:
+            timeout = self.period_time * (num_periods + 1) + 1 + num_periods * self.MAX_LINE_BYTES / 1000.0
+        self.start_counting(num_periods)
+        self.sr400.write(f"E{channel}\n")
+        if hasattr(self.sr400, "expect"):
+            self.sr400.expect(num_periods)
+        deadline = time.time() + timeout
+        buf = bytearray()
+        received = 0
+        try:
+            while received < num_periods and time.time() < deadline:
+                if should_continue is not None and not should_continue():
+                    break
+                pending = self.pending_bytes()
+                if pending is None:
+                    # No byte count (GPIB): read() blocks until the next period's line
+                    try:
+                        buf += self.read_line()
+                    except Exception:
+                        continue  # read timeout while a long period is still counting
+                elif not pending:
+                    time.sleep(min(max(self.period_time, self.POLL_MIN), self.POLL_MAX))
+                    continue
+                else:
+                    buf += self.sr400.read_bytes(min(pending, self.DUMP_CHUNK_SIZE), break_on_termchar=False)
+                end = buf.rfind(b"\n")
+                if end < 0:
+                    continue
+                chunk = parse_dump(bytes(buf[:end + 1]), num_periods - received)
+                del buf[:end + 1]
+                if len(chunk):
+                    received += len(chunk)
+                    yield chunk
+            if received < num_periods:
+                print(f"Stream ended after {received} of {num_periods} periods")
+        finally:
+            self.sr400.write("CR\n")
+            if received < num_periods:
+                self.drain_input()  # dump lines already sent would be read as the next answers
+
+    def drain_input(self, quiet=0.05, timeout=2.0):
+        """Discards whatever the SR400 still sends (e.g. the rest of a stopped dump) until the input stays quiet."""
+        deadline = time.time() + timeout
+        last_data = time.time()
+        discarded = 0
+        while time.time() - last_data < quiet and time.time() < deadline:
+            pending = self.pending_bytes()
+            if pending is None:
+                break  # cannot tell what is waiting, leave it to clear()
+            if pending:
+                discarded += len(self.sr400.read_bytes(pending, break_on_termchar=False))
+                last_data = time.time()
+            else:
+                time.sleep(self.POLL_MIN)
+        if hasattr(self.sr400, "clear"):
+            self.sr400.clear()
+        return discarded
+
+    def pending_bytes(self):
+        """Bytes waiting in the input buffer, or None if the resource cannot tell (pyvisa GPIB resources)."""
+        try:
+            return self.sr400.bytes_in_buffer
+        except AttributeError:
+            return None
+
+    def read_line(self):
+        """One response line read with read(), as terminated bytes like read_bytes() returns them."""
+        return (self.sr400.read().rstrip("\r\n") + "\n").encode("ascii")
+
+    def periods_done(self):
+        """Returns the number of completed periods (NN), or None if the query failed."""
+        try:
+            return int(float(self.sr400.query("NN").strip()))
+        except Exception as e:
+            print(f"Error polling NN: {e}")
+            return None
+
+    def wait_for_completion(self, num_periods=None, timeout=None, should_continue=None):
+        """Polls NN until num_periods are counted; True once done, False on timeout/stop."""
+        if num_periods is None:
+            num_periods = self.num_periods
+        if timeout is None:
+            timeout = self.period_time * (num_periods + 1) + 1  # the old fixed worst case
+        deadline = time.time() + timeout
+        interval = self.POLL_MIN
+        last_done = -1
+        while time.time() < deadline:
+            if should_continue is not None and not should_continue():
+                return False
+            done = self.periods_done()
+            if done is not None and done >= num_periods:
+                return True
+            if done is not None and done > last_done:
+                # Still counting: sleep about as long as the remaining periods need
+                last_done = done
+                interval = (num_periods - done) * self.period_time
+            else:
+                interval *= 2  # no progress seen, back off
+            interval = min(max(interval, self.POLL_MIN), self.POLL_MAX, max(deadline - time.time(), 0))
+            time.sleep(interval)
+        return False
+
+    def read_buffer(self, channel="A", num_periods=None):
+        """Dumps the A or B buffer (EA/EB) and returns it as an int array, one row per period."""
+        if num_periods is None:
+            num_periods = self.num_periods
+        self.sr400.write(f"E{channel}\n")
+        if not self.bulk_dump:
+            rows = []
+            for _ in range(num_periods):
+                response = self.sr400.read().rstrip()
+                if response:
+                    rows.append(list(map(int, response.split(','))))
+                else:
+                    print("Empty response received")
+            return np.array(rows, dtype=np.int64)
+        raw = self.read_raw_lines(num_periods)
+        return parse_dump(raw, num_periods)
+
+    def read_raw_lines(self, num_lines):
+        """Reads num_lines terminated lines as one byte stream, in large chunks (line by line without bytes_in_buffer)."""
+        expected = num_lines * self.MAX_LINE_BYTES
+        if hasattr(self.sr400, "expect"):
+            self.sr400.expect(num_lines)
+        buf = bytearray()
+        lines = 0
+        while lines < num_lines and len(buf) < expected:
+            pending = self.pending_bytes()
+            if pending is None:
+                try:
+                    chunk = self.read_line()  # GPIB: line by line
+                except Exception as e:
+                    print(f"Error reading buffer line: {e}")
+                    break
+            else:
+                size = max(1, min(pending, self.DUMP_CHUNK_SIZE, expected - len(buf)))
+                chunk = self.sr400.read_bytes(size, break_on_termchar=False)
+            if not chunk:
+                break
+            buf += chunk
+            lines += chunk.count(b"\n")
+        if lines < num_lines:
+            print(f"Buffer dump incomplete: {lines} of {num_lines} lines received")
+        return bytes(buf)
+
+    def stop_acquisition(self):
+        """Stops the SR400 acquisition gracefully."""
+        self.sr400.write("CR\n")
+
+    def close(self):
+        """Closes the connection to the SR400."""
+        self.sr400.close()
+        if self.rm is not None:
+            self.rm.close()
+
+    def query(self, command):
+        """Sends a query to the SR400 and returns the response."""
+        try:
+            response = self.sr400.query(command)
+            return response
+        except Exception as e:
+            print(f"Error sending query: {e}")
+            return None
@@ -0,0 +1,200 @@
+#sr400_sim.py
+import time
+import threading
+import numpy as np
+
+
+class SimulatedSR400:
+    """Software SR400 behind the same resource API as pyvisa/PrologixTransport.
+
+    Understands the commands the apps send (CP2, NP, DT, CR, CS, CH, CL,
+    EA/EB, QA/QB, FA/FB, NN, DL, GM, ';'-joined lines). Counts are Poisson
+    with rate_a/rate_b counts/s, optionally a function of the channel's
+    discriminator level. Periods take tset + dwell of wall time, and every
+    response byte takes byte_time to come out, so transfers cost about what
+    they cost on the real serial link.
+    """
+
+    def __init__(self, rate_a=1000.0, rate_b=100.0, baudrate=115200, command_latency=0.002, seed=None):
+        self.rates = {"A": rate_a, "B": rate_b}
+        self.byte_time = 10.0 / baudrate  # 8N1: 10 bits per byte
+        self.command_latency = command_latency
+        self.rng = np.random.default_rng(seed)
+        self.timeout = 5.0
+        self.lock = threading.Lock()
+        self._out = []  # [start time, bytes] of queued responses
+        self._out_end = 0.0  # when the last queued byte is on the wire
+        self.clear_settings()
+        self.reset_counts()
+
+    # --- instrument state ---
+    def clear_settings(self):
+        self.tset = 1.0
+        self.dwell = 0.002
+        self.num_periods = 1
+        self.levels = {"A": 0.0, "B": 0.0, "T": 0.0}
+        self.gate_modes = {"A": 0, "B": 0}
+
+    def reset_counts(self):
+        self.start_time = None
+        self.counts = {"A": np.zeros(0, dtype=np.int64), "B": np.zeros(0, dtype=np.int64)}
+        # A running EA/EB dump stops: lines not sent yet are dropped, the ones already sent stay to be read
+        now = time.time()
+        self._out = [segment for segment in self._out if segment[0] <= now]
+        last = self._out[-1] if self._out else None
+        self._out_end = last[0] + len(last[1]) * self.byte_time if last else now
+
+    @property
+    def period_time(self):
+        return self.tset + self.dwell
+
+    def rate(self, channel):
+        rate = self.rates[channel]
+        return rate(self.levels[channel]) if callable(rate) else rate
+
+    def periods_done(self, now=None):
+        """Completed periods of the current run."""
+        if self.start_time is None:
+            return len(self.counts["A"])
+        now = time.time() if now is None else now
+        return int(min(max(now - self.start_time, 0.0) // self.period_time, self.num_periods))
+
+    def period_end(self, index):
+        return self.start_time + (index + 1) * self.period_time
+
+    def start(self):
+        self.start_time = time.time()
+        self.counts = {channel: self.rng.poisson(self.rate(channel) * self.tset, self.num_periods)
+                       for channel in ("A", "B")}
+
+    def hold(self):
+        done = self.periods_done()
+        self.counts = {channel: values[:done] for channel, values in self.counts.items()}
+        self.start_time = None
+
+    # --- command handling ---
+    def execute(self, command):
+        command = command.strip().upper()
+        if not command:
+            return
+        name, args = command[:2], command[2:].replace(",", " ").split()
+        now = time.time()
+        if name == "CP" and len(args) > 1 and args[0] == "2":
+            self.tset = float(args[1]) * 1e-7  # 10 MHz time base
+        elif name == "NP" and args:
+            self.num_periods = max(1, min(int(float(args[0])), 2000))
+        elif name == "DT" and args:
+            self.dwell = float(args[0])
+        elif name == "DL" and len(args) > 1:
+            self.levels["ABT"[int(args[0])]] = float(args[1])
+        elif name == "GM" and len(args) > 1:
+            self.gate_modes["AB"[int(args[0])]] = int(args[1])
+        elif name == "CR":
+            self.reset_counts()
+        elif name == "CS":
+            self.start()
+        elif name == "CH":
+            self.hold()
+        elif name == "CL":
+            self.clear_settings()
+            self.reset_counts()
+        elif name == "NN":
+            self.respond(f"{self.periods_done(now)}", now)
+        elif name in ("QA", "QB"):
+            done = self.periods_done(now)
+            value = self.counts[name[1]][done - 1] if done else 0
+            self.respond(f"{value}", now)
+        elif name in ("EA", "EB"):
+            values = self.counts[name[1]]
+            for index, value in enumerate(values):
+                ready = now if self.start_time is None else max(now, self.period_end(index))
+                self.respond(f"{value}", ready)
+        elif name in ("FA", "FB"):
+            # One fresh period, answered when it ends
+            value = self.rng.poisson(self.rate(name[1]) * self.tset)
+            self.respond(f"{value}", now + self.period_time)
+
+    def respond(self, text, ready):
+        data = f"{text}\r\n".encode("ascii")
+        start = max(ready, self._out_end)
+        self._out.append([start, data])
+        self._out_end = start + len(data) * self.byte_time
+
+    def _available(self, now):
+        """Bytes that have fully arrived by now."""
+        total = 0
+        for start, data in self._out:
+            if now < start:
+                break
+            arrived = min(int((now - start) / self.byte_time), len(data))
+            total += arrived
+            if arrived < len(data):
+                break
+        return total
+
+    def _take(self, count):
+        buf = bytearray()
+        while self._out and len(buf) < count:
+            segment = self._out[0]
+            need = count - len(buf)
+            buf += segment[1][:need]
+            if need >= len(segment[1]):
+                self._out.pop(0)
+            else:
+                segment[0] += need * self.byte_time
+                segment[1] = segment[1][need:]
+        return bytes(buf)
+
+    def _wait_for(self, count):
+        """Sleeps until count bytes are available or the timeout passes."""
+        deadline = time.time() + self.timeout
+        while True:
+            now = time.time()
+            with self.lock:
+                available = self._available(now)
+                queued = sum(len(data) for _, data in self._out)
+            if available >= min(count, queued) or now >= deadline:
+                return available
+            time.sleep(min(max(count - available, 1) * self.byte_time, 0.01, deadline - now))
+
+    # --- resource API ---
+    def write(self, message):
+        time.sleep(self.command_latency)
+        with self.lock:
+            for command in message.split(";"):
+                self.execute(command)
+
+    def read(self):
+        with self.lock:
+            if not self._out:
+                raise TimeoutError("SimulatedSR400: nothing to read")
+            line_length = len(self._out[0][1])
+        available = self._wait_for(line_length)
+        if available < line_length:
+            raise TimeoutError("SimulatedSR400: read timed out")
+        with self.lock:
+            return self._take(line_length).decode("ascii")
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    @property
+    def bytes_in_buffer(self):
+        with self.lock:
+            return self._available(time.time())
+
+    def read_bytes(self, count, break_on_termchar=False):
+        available = self._wait_for(count)
+        with self.lock:
+            return self._take(min(count, max(available, 0)))
+
+    def close(self):
+        pass
+
+
+def open_simulator(resource_name):
+    """Opens a "sim[:RATE_A[:RATE_B]]" resource name, e.g. "sim:5000:200"."""
+    parts = resource_name.split(":")
+    rates = [float(part) for part in parts[1:3]]
+    return SimulatedSR400(*rates)
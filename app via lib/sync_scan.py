@@ -0,0 +1,110 @@
+#sync_scan.py
+import datetime
+import time
+import numpy as np
+
+
+class ScanMap:
+    """Counts per ramp step and cycle, each tagged with the generator state (w17, w18) it was counted at.
+
+    Step 0..steps-1 is the ramp up, steps..2*steps-1 the ramp down, so
+    matrix() is a (2*steps) x cycles map. Cells not counted yet are NaN.
+    """
+
+    def __init__(self, num_cycles, steps, channels="AB"):
+        self.num_cycles = num_cycles
+        self.steps = steps
+        self.channels = channels
+        shape = (2 * steps, num_cycles)
+        self.counts = np.full(shape + (len(channels),), np.nan)
+        self.w17 = np.zeros(shape, dtype=np.int64)
+        self.w18 = np.zeros(shape, dtype=np.int64)
+        self.times = np.full(shape, np.nan)  # wall time the period started
+        self.filled = 0
+        self.start_time = time.time()
+
+    def add(self, cycle, step, w17, w18, counts, timestamp):
+        self.counts[step, cycle] = counts
+        self.w17[step, cycle] = w17
+        self.w18[step, cycle] = w18
+        self.times[step, cycle] = timestamp
+        self.filled += 1
+
+    def matrix(self, channel="A"):
+        """Counts of one channel, rows = step, columns = cycle."""
+        return self.counts[:, :, self.channels.index(channel)]
+
+    def save(self, path):
+        """Writes one CSV row per counted step: cycle, step, w17, w18, time and the counts."""
+        with open(path, "w") as f:
+            f.write(f"# steps {self.steps} up + {self.steps} down, cycles {self.num_cycles}, "
+                    f"started {datetime.datetime.fromtimestamp(self.start_time):%Y-%m-%d %H:%M:%S}\n")
+            f.write(",".join(["cycle", "step", "w17", "w18", "time"] + list(self.channels)) + "\n")
+            for cycle in range(self.num_cycles):
+                for step in range(2 * self.steps):
+                    if np.isnan(self.times[step, cycle]):
+                        continue
+                    counts = ",".join(f"{value:g}" for value in self.counts[step, cycle])
+                    f.write(f"{cycle},{step},{self.w17[step, cycle]},{self.w18[step, cycle]},"
+                            f"{self.times[step, cycle]:.6f},{counts}\n")
+
+    def save_matrix(self, path, channel="A"):
+        """Writes the step x cycle map of one channel as plain CSV (NaN where not counted)."""
+        np.savetxt(path, self.matrix(channel), delimiter=",", fmt="%g")
+
+
+class SynchronizedScan:
+    """Counts one SR400 period at every w17 step of SerialDeviceController.run_sequence.
+
+    Pass count_step as run_sequence's on_step: the sequence sets w17 (and
+    waits its inner_sleep to settle), then count_step starts a one-period
+    run, waits for it, reads QA/QB in one line and stores them in the
+    ScanMap under (cycle, step, w17, w18). The ramp waits for the count, so
+    nothing has to be matched by timestamp afterwards.
+    callback(event) gets {"kind": "step"|"finished", "map", ...} for a live view.
+    """
+
+    def __init__(self, device, num_cycles, steps, channels="AB", callback=None):
+        self.device = device
+        self.channels = channels
+        self.callback = callback
+        self.map = ScanMap(num_cycles, steps, channels)
+
+    def publish(self, kind, **payload):
+        if self.callback is not None:
+            payload["kind"] = kind
+            payload["map"] = self.map
+            try:
+                self.callback(payload)
+            except Exception as e:
+                print(f"Error in scan callback: {e}")
+
+    def count_period(self):
+        """Runs exactly one period and returns its counts per channel."""
+        device = self.device
+        device.start_counting(1)
+        time.sleep(device.period_time)
+        deadline = time.time() + device.period_time + 1
+        queries = ["NN"] + [f"Q{channel}" for channel in self.channels]
+        while True:
+            answers = device.query_many(queries)
+            if int(float(answers[0])) >= 1:
+                return [int(float(answer)) for answer in answers[1:]]
+            if time.time() > deadline:
+                raise RuntimeError("SR400 period did not finish")
+            time.sleep(device.POLL_MIN)
+
+    def count_step(self, cycle, step, w17, w18):
+        """on_step hook for run_sequence; errors stop the sequence."""
+        counts = self.count_period()
+        self.map.add(cycle, step, w17, w18, counts, self.device.last_start_time)
+        self.publish("step", cycle=cycle, step=step, w17=w17, w18=w18, counts=counts)
+
+    def run(self, controller, params, log_callback=print):
+        """Runs the generator sequence with a count at every step; returns the ScanMap."""
+        try:
+            controller.run_sequence(params, log_callback, on_step=self.count_step)
+        finally:
+            self.device.stop_acquisition()
+            self.publish("finished")
+        return self.map
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from decimate import DecimatedSeries
+
+
+def test_view_keeps_extremes_for_random_extends():
+    rng = np.random.default_rng(1)
+    series = DecimatedSeries(x0=1)
+    y = np.zeros(0)
+    for size in rng.integers(1, 700, size=40):
+        values = rng.poisson(20, size).astype(np.float64)
+        values[rng.integers(size)] += rng.choice([-100.0, 100.0])  # single-period peak or dip
+        series.extend(values)
+        y = np.concatenate((y, values))
+        for pixels in (1, 2, 7, 100):
+            xs, ys = series.view(pixels=pixels)
+            assert ys.min() == y.min() and ys.max() == y.max()
+            assert xs[0] == 1 and xs[-1] == len(y)  # the line spans the whole series
+            assert np.array_equal(ys, y[(xs - 1).astype(np.int64)])
+
+
+def test_view_of_sub_range_spans_it():
+    rng = np.random.default_rng(2)
+    series = DecimatedSeries(x0=1)
+    series.extend(rng.poisson(20, 5000).astype(np.float64))
+    for _ in range(20):
+        x_min, x_max = np.sort(rng.integers(1, 5001, size=2))
+        xs, ys = series.view(x_min, x_max, pixels=50)
+        assert xs[0] <= x_min and xs[-1] >= x_max
+        assert len(xs) <= 4 * 50 + 2 * series.FACTOR ** 2
+
+
+def test_collapsed_axes_on_a_short_series():
+    series = DecimatedSeries(x0=1)
+    series.extend([5.0, 1.0, 9.0])
+    xs, ys = series.view(pixels=1)
+    assert ys.tolist() == [5.0, 1.0, 9.0]
+    series.extend([3.0])  # first complete block, a level to pick from
+    xs, ys = series.view(pixels=1)
+    assert ys.min() == 1.0 and ys.max() == 9.0
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sr400_device import parse_dump
+
+
+def test_one_and_two_columns():
+    assert parse_dump(b"1\r\n2\r\n3\r\n").tolist() == [[1], [2], [3]]
+    assert parse_dump(b"1,2\r\n3,4\r\n", num_lines=1).tolist() == [[1, 2]]
+    assert parse_dump(b"").shape == (0, 1)
+
+
+def test_short_line_is_dropped_not_shifted():
+    assert parse_dump(b"1,2\r\n3\r\n5,6\r\n").tolist() == [[1, 2], [5, 6]]
+
+
+def test_garbled_bytes_drop_only_their_line():
+    assert parse_dump(b"1\r\n2x\r\n3\r\n").tolist() == [[1], [3]]
+    assert parse_dump(b"7,8\r\n\xff\x00,9\r\n10,11\r\n").tolist() == [[7, 8], [10, 11]]
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+pytest.importorskip("serial")
+if not hasattr(os, "openpty"):
+    pytest.skip("needs a pseudo-terminal", allow_module_level=True)
+
+from prologix import PrologixTransport
+from prologix_sim import PrologixEmulator
+from sr400_device import SR400Device
+from sr400_sim import SimulatedSR400
+
+
+@pytest.fixture
+def emulator():
+    emulator = PrologixEmulator({23: SimulatedSR400(rate_a=1000.0, rate_b=0.0, seed=1)})
+    yield emulator
+    emulator.close()
+
+
+@pytest.fixture
+def device(emulator, monkeypatch):
+    monkeypatch.setattr(PrologixTransport, "READ_TMO_MS", 20)  # leftover read-aheads run out quickly
+    device = SR400Device(f"prologix:{emulator.port}:23")
+    yield device
+    device.close()
+
+
+def timed_query(device, command):
+    started = time.time()
+    answer = device.sr400.query(command).strip()
+    return answer, time.time() - started
+
+
+def test_adapter_setup(emulator, device):
+    for command in (b"++mode 1", b"++auto 0", b"++read_tmo_ms 20", b"++addr 23"):
+        assert emulator.wait_for(command), command
+    assert emulator.read_tmo_ms == 20
+
+
+def test_query_dump_query(device):
+    device.tset = 0.001
+    device.num_periods = 100
+    assert timed_query(device, "NN")[0] == "0"
+
+    data = device.acquire_data()
+    assert data.shape == (100, 1)
+    assert 0 < data.mean() < 5
+
+    # Read-ahead requests are still queued in the adapter right after the dump
+    answer, elapsed = timed_query(device, "NN")
+    assert answer == "0" and elapsed < 1.0
+
+    # ... and have all run out in the adapter a while later
+    assert device.acquire_data().shape == (100, 1)
+    time.sleep(1.0)
+    answer, elapsed = timed_query(device, "NN")
+    assert answer == "0" and elapsed < 1.0
+
+
+def test_escaped_data(emulator, device):
+    device.sr400.write("CR;NP +5")
+    assert emulator.wait_for(b"CR;NP +5")
+    assert emulator.instruments[23].num_periods == 5
@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from runfile import RunWriter, open_run
+
+
+def test_header_keeps_settings_changed_before_stop(tmp_path):
+    path = str(tmp_path / "run.sr4")
+    writer = RunWriter(path, tset=0.001, num_periods=3, experiments=1000)
+    writer.write_rows([[1, 2], [3, 4], [5, 6]])
+    writer.experiments = 2  # precision mode: -m was only a cap
+    writer.stop()
+    header, counts = open_run(path)
+    assert header["experiments"] == 2
+    assert header["channels"] == "AB"
+    assert counts.tolist() == [[1, 2], [3, 4], [5, 6]]
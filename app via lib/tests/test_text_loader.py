@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from text_loader import load_text, parse_text
+
+GOOD = ("2025-02-05 14:44:02.125035 - 12.0 1.0\n"
+        "2025-02-05 14:44:02.127045 - 13.0 2.0\n"
+        "2025-02-05 14:44:02.129043 - 27.0 3.0\n")
+
+
+def test_well_formed():
+    timestamps, values = parse_text(GOOD)
+    assert values.tolist() == [[12.0, 1.0], [13.0, 2.0], [27.0, 3.0]]
+    assert np.allclose(np.diff(timestamps), [0.00201, 0.001998], atol=1e-6)
+
+
+def test_float_timestamps():
+    timestamps, values = parse_text("1738766642.5 - 4.0\n1738766643.5 - 5.0\n")
+    assert timestamps.tolist() == [1738766642.5, 1738766643.5]
+    assert values[:, 0].tolist() == [4.0, 5.0]
+
+
+def test_corrupt_lines_are_skipped_whole():
+    lines = GOOD.splitlines()
+    corrupt = "\n".join([
+        lines[0],
+        "2025-02-05 14:44:02.126 - 99.x 9.0",  # bad value
+        "2025-02-05 14:44:02.1265 - 98.0",  # value missing
+        "2025-02-05 14:4 - 97.0 9.0",  # bad timestamp
+        "garbage without separator",
+        lines[1],
+        lines[2],
+    ])
+    timestamps, values = parse_text(corrupt)
+    expected_times, expected_values = parse_text(GOOD)
+    assert values.tolist() == expected_values.tolist()
+    assert timestamps.tolist() == expected_times.tolist()
+
+
+def test_load_text_cache(tmp_path):
+    path = tmp_path / "+250.txt"
+    path.write_text(GOOD + "2025-02-05 14:44:02.131 - 5\n")
+    first = load_text(str(path))
+    assert os.path.exists(str(path) + ".cache.npz")
+    second = load_text(str(path))
+    assert len(first[0]) == len(first[1]) == 3
+    assert second[1].tolist() == first[1].tolist()
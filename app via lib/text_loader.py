@@ -0,0 +1,102 @@
+#text_loader.py
+import os
+import warnings
+import numpy as np
+
+SEPARATOR = " - "
+CACHE_SUFFIX = ".cache.npz"
+
+
+def parse_text(text):
+    """Parses "timestamp - v1 v2 ..." lines into (timestamps, values).
+
+    timestamps is float64 seconds since the epoch. Both timestamp styles
+    the apps write are understood: raw time.time() floats and
+    "%Y-%m-%d %H:%M:%S.%f" (taken as naive, no timezone shift). values is
+    a float64 array with one row per line. Malformed lines are skipped
+    whole, so timestamps and values stay row-aligned.
+    """
+    text = text.strip()
+    if not text:
+        return np.zeros(0), np.zeros((0, 1))
+    parts = text.replace("\r\n", "\n").replace(SEPARATOR, "\n").split("\n")
+    heads, tails = parts[0::2], parts[1::2]
+    if len(heads) == len(tails) and all(tails):
+        try:
+            return _parse_columns(heads, tails)
+        except ValueError:
+            pass
+    # Blank or malformed lines: go line by line
+    return _parse_lines(text)
+
+
+def _parse_columns(heads, tails):
+    """Fast path for well-formed files; ValueError if any line does not parse."""
+    width = len(tails[0].split())
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # fromstring warns where it stops early
+        values = np.fromstring(" ".join(tails), dtype=np.float64, sep=" ")
+    if not width or values.size != len(tails) * width:
+        raise ValueError("malformed values")
+    values = values.reshape(-1, width)
+    if ":" in heads[0]:
+        timestamps = np.array(heads, dtype="datetime64[us]").astype(np.int64) / 1e6
+    else:
+        timestamps = np.array(heads, dtype=np.float64)
+    return timestamps, values
+
+
+def _parse_lines(text):
+    stamps = []
+    rows = []
+    for line in text.splitlines():
+        head, separator, tail = line.partition(SEPARATOR)
+        if not separator:
+            continue
+        try:
+            row = [float(value) for value in tail.split()]
+            if ":" in head:
+                stamp = np.datetime64(head.strip(), "us").astype(np.int64) / 1e6
+            else:
+                stamp = float(head)
+        except ValueError:
+            continue
+        if not row or (rows and len(row) != len(rows[0])):
+            continue
+        stamps.append(stamp)
+        rows.append(row)
+    if not rows:
+        return np.zeros(0), np.zeros((0, 1))
+    return np.array(stamps, dtype=np.float64), np.array(rows, dtype=np.float64)
+
+
+def cache_path(path):
+    return path + CACHE_SUFFIX
+
+
+def load_text(path, use_cache=True):
+    """Loads a recorded text file, reusing a sidecar .cache.npz while the file's mtime/size are unchanged."""
+    stat = os.stat(path)
+    key = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    sidecar = cache_path(path)
+    if use_cache and os.path.exists(sidecar):
+        try:
+            with np.load(sidecar) as cached:
+                if np.array_equal(cached["key"], key):
+                    return cached["timestamps"], cached["values"]
+        except Exception as e:
+            print(f"Ignoring broken cache {sidecar}: {e}")
+    with open(path, "r", encoding="ascii", errors="ignore") as f:
+        timestamps, values = parse_text(f.read())
+    if use_cache:
+        try:
+            with open(sidecar, "wb") as f:
+                np.savez(f, key=key, timestamps=timestamps, values=values)
+        except OSError as e:
+            print(f"Could not write cache {sidecar}: {e}")
+    return timestamps, values
+
+
+def load_many(paths, use_cache=True):
+    """{path: (timestamps, values)} for a list of recorded files, e.g. a glob of a threshold sweep."""
+    return {path: load_text(path, use_cache) for path in paths}
@@ -0,0 +1,63 @@
+#ui_bus.py
+import threading
+
+
+class UiBus:
+    """Hands snapshots from worker threads to the Tk main loop.
+
+    Workers call publish(topic, snapshot) - it only stores the snapshot
+    under a lock, never touches Tk and never waits for a redraw. A pump on
+    the Tk thread (root.after every `frame` seconds) takes the latest
+    snapshot of each topic and calls that topic's handler once, so however
+    fast data arrives there is at most one label/plot refresh per frame.
+    Snapshots should not be changed after publishing (tuples, dicts built
+    for the call, arrays nobody writes to again).
+    """
+
+    def __init__(self, root, frame=0.05):
+        self.root = root
+        self.frame = frame
+        self.handlers = {}  # topic -> callback(snapshot)
+        self.pending = {}  # topic -> latest snapshot not yet handled
+        self.lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.after_id = None
+
+    def subscribe(self, topic, callback):
+        self.handlers[topic] = callback
+
+    def publish(self, topic, snapshot=None):
+        """Thread-safe; an older snapshot of the same topic that was not shown yet is dropped."""
+        with self.lock:
+            self.pending[topic] = snapshot
+            self.published += 1
+
+    def start(self):
+        """Starts the pump; call from the Tk thread."""
+        if self.after_id is None:
+            self.pump()
+        return self
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def pump(self):
+        self.flush()
+        self.after_id = self.root.after(int(self.frame * 1000), self.pump)
+
+    def flush(self):
+        """Runs the handlers for everything published since the last frame (Tk thread only)."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for topic, snapshot in pending.items():
+            handler = self.handlers.get(topic)
+            if handler is None:
+                continue
+            try:
+                handler(snapshot)
+                self.delivered += 1
+            except Exception as e:
+                print(f"Error updating the UI ({topic}): {e}")
@@ -0,0 +1,94 @@
+#waveform.py
+import numpy as np
+
+
+class WaveformAccumulator:
+    """Counts vs. period index, averaged element-wise over M experiments.
+
+    Buffers are preallocated for num_periods bins and one column per
+    channel. Every experiment adds one sample to each bin it reached, with
+    a per-bin Welford update, so mean and variance per bin are available at
+    any time (also in the middle of an experiment, for a live view).
+    Subscribe on_event to an AcquisitionEngine to feed it.
+    """
+
+    def __init__(self, num_periods, channels="A"):
+        self.num_periods = num_periods
+        self.channels = channels
+        width = len(channels)
+        self.count = np.zeros(num_periods, dtype=np.int64)  # experiments that reached each bin
+        self.mean = np.zeros((num_periods, width))
+        self.m2 = np.zeros((num_periods, width))  # sum of squared deviations per bin
+        self.experiments = 0
+        self.cursor = 0  # next bin of the current experiment
+        self.dropped = 0  # periods past num_periods, not accumulated
+
+    def begin_experiment(self):
+        if self.cursor:
+            self.experiments += 1
+        self.cursor = 0
+
+    def end_experiment(self):
+        self.begin_experiment()
+
+    def add(self, rows):
+        """Adds the next periods of the current experiment (rows: periods x channels)."""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows[:, None]
+        rows = rows[:, :self.mean.shape[1]]
+        end = min(self.cursor + len(rows), self.num_periods)
+        self.dropped += self.cursor + len(rows) - end
+        rows = rows[:end - self.cursor]
+        if not len(rows):
+            return
+        bins = slice(self.cursor, end)
+        self.count[bins] += 1
+        n = self.count[bins, None]
+        delta = rows - self.mean[bins]
+        self.mean[bins] += delta / n
+        self.m2[bins] += delta * (rows - self.mean[bins])
+        self.cursor = end
+
+    def on_event(self, event):
+        """AcquisitionEngine subscriber: accumulates streamed chunks, or whole experiments when not streaming."""
+        kind = event["kind"]
+        if kind == "start":
+            self.begin_experiment()
+        elif kind == "chunk":
+            self.add(event["data"])
+        elif kind == "experiment":
+            if self.cursor == 0:
+                self.add(event["data"])
+            self.end_experiment()
+
+    @property
+    def variance(self):
+        """Sample variance per bin and channel (0 where fewer than two experiments reached the bin)."""
+        n = self.count[:, None]
+        return np.divide(self.m2, n - 1, out=np.zeros_like(self.m2), where=n > 1)
+
+    @property
+    def sem(self):
+        """Standard error of each bin's mean."""
+        n = self.count[:, None]
+        return np.divide(np.sqrt(self.variance), np.sqrt(n), out=np.zeros_like(self.m2), where=n > 0)
+
+    def view(self, channel="A"):
+        """(period index from 1, mean counts, standard error) over the bins reached so far."""
+        column = self.channels.index(channel)
+        reached = int(np.count_nonzero(self.count))
+        index = np.arange(1, reached + 1)
+        return index, self.mean[:reached, column], self.sem[:reached, column]
+
+    def save(self, path):
+        """Writes period, experiments and mean/std/sem per channel as CSV."""
+        reached = int(np.count_nonzero(self.count))
+        std = np.sqrt(self.variance)
+        columns = [np.arange(1, reached + 1), self.count[:reached]]
+        header = ["period", "experiments"]
+        for i, channel in enumerate(self.channels):
+            columns += [self.mean[:reached, i], std[:reached, i], self.sem[:reached, i]]
+            header += [f"mean_{channel}", f"std_{channel}", f"sem_{channel}"]
+        np.savetxt(path, np.column_stack(columns), delimiter=",", header=",".join(header), comments="",
+                   fmt=["%d", "%d"] + ["%.6g"] * (3 * len(self.channels)))
@@ -2,12 +2,18 @@ import tkinter as tk
 import threading
 import time
 import datetime
+import os
+import sys
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from queue import Queue
 import pyvisa
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app via lib"))
+from blit_plot import BlitPlot
+
 class App:
     def __init__(self, root):
         self.root = root
@@ -78,12 +84,19 @@ class App:
         self.ax = self.fig.add_subplot(111)
         self.ax.set_facecolor("#333842")
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
         self.ax.set_title('Data from SR400', fontsize=16)
         self.ax.set_xlabel('Time')
         self.ax.set_ylabel('Values')
         self.ax.grid(True)
+        self.ax.xaxis_date()
+        # Persistent lines, updated in place and blitted (see update_plot)
+        self.f_line, = self.ax.plot([], [], label='F', linestyle='-', color='blue')
+        self.n_line, = self.ax.plot([], [], label='N', linestyle='-', color='red')
+        self.x_line, = self.ax.plot([], [], label='X', linestyle='-', color='green')
+        self.ax.legend()
+        self.plotter = BlitPlot(self.canvas, self.ax, [self.f_line, self.n_line, self.x_line])
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
 
     def create_row_1(self):
         """Creates elements for the first row."""
@@ -288,6 +301,7 @@ class App:
         self.n_value = 0.0
         self.x_value = 0.0
         self.data_list = []
+        self.plotter.reset()
 
         self.update_gui_values()
         self.update_plot()
@@ -351,16 +365,8 @@ class App:
             self.n_values = self.n_values[-self.MAX_DATA_POINTS:]
             self.x_values = self.x_values[-self.MAX_DATA_POINTS:]
 
-        self.ax.clear()
-        self.ax.plot(self.times, self.f_values, label='F', linestyle='-', color='blue')
-        self.ax.plot(self.times, self.n_values, label='N', linestyle='-', color='red')
-        self.ax.plot(self.times, self.x_values, label='X', linestyle='-', color='green')
-        self.ax.set_title('Data from SR400', fontsize=16)
-        self.ax.set_xlabel('Time')
-        self.ax.set_ylabel('Values')
-        self.ax.grid(True)
-        self.ax.legend()
-        self.canvas.draw()
+        times = mdates.date2num(self.times)
+        self.plotter.update([(times, self.f_values), (times, self.n_values), (times, self.x_values)])
         self.last_plot_time = current_time
 
     def process_data_queue(self):
@@ -387,8 +393,7 @@ class App:
 
             if self.is_recording:
               timestamp = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-              with open(self.recording_file.name, "a") as rec_file:
-                  rec_file.write(f"{timestamp} - {formatted_data}\n")
+              self.recording_file.write(f"{timestamp} - {formatted_data}\n")
 
             self.update_gui_values()
 
@@ -411,7 +416,7 @@ class App:
             self.is_recording = True
             try:
                 filename = f"recorded_data_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                self.recording_file = open(filename, "w")
+                self.recording_file = open(filename, "w", buffering=1 << 16)
                 self.record_button.config(text="Stop Rec")
             except Exception as e:
                 print(f"Error creating file: {e}")
@@ -527,12 +532,19 @@ class App:
         self.ax = self.fig.add_subplot(111)
         self.ax.set_facecolor("#333842")
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
         self.ax.set_title('Data', fontsize=16)
         self.ax.set_xlabel('Time')
         self.ax.set_ylabel('Values')
         self.ax.grid(True)
+        self.ax.xaxis_date()
+        # Persistent lines, updated in place and blitted (see update_plot)
+        self.f_line, = self.ax.plot([], [], label='F', linestyle='-', color='blue')
+        self.n_line, = self.ax.plot([], [], label='N', linestyle='-', color='red')
+        self.x_line, = self.ax.plot([], [], label='X', linestyle='-', color='green')
+        self.ax.legend()
+        self.plotter = BlitPlot(self.canvas, self.ax, [self.f_line, self.n_line, self.x_line])
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
 
     def create_row_1(self):
         """Creates elements for the first row."""
@@ -726,6 +738,7 @@ class App:
         self.n_value = 0.0
         self.x_value = 0.0
         self.data_list = []
+        self.plotter.reset()
 
         self.update_gui_values()
         self.update_plot()
@@ -813,16 +826,8 @@ class App:
             self.n_values = self.n_values[-self.MAX_DATA_POINTS:]
             self.x_values = self.x_values[-self.MAX_DATA_POINTS:]
 
-        self.ax.clear()
-        self.ax.plot(self.times, self.f_values, label='F', linestyle='-', color='blue')
-        self.ax.plot(self.times, self.n_values, label='N', linestyle='-', color='red')
-        self.ax.plot(self.times, self.x_values, label='X', linestyle='-', color='green')
-        self.ax.set_title('Data', fontsize=16)
-        self.ax.set_xlabel('Time')
-        self.ax.set_ylabel('Values')
-        self.ax.grid(True)
-        self.ax.legend()
-        self.canvas.draw()
+        times = mdates.date2num(self.times)
+        self.plotter.update([(times, self.f_values), (times, self.n_values), (times, self.x_values)])
         self.last_plot_time = current_time
 
     def process_data_queue(self):
@@ -849,8 +854,7 @@ class App:
 
             if self.is_recording:
                 timestamp = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-                with open(self.recording_file.name, "a") as rec_file:
-                    rec_file.write(f"{timestamp} - {formatted_data}\n")
+                self.recording_file.write(f"{timestamp} - {formatted_data}\n")
 
             self.update_gui_values()
 
@@ -873,7 +877,7 @@ class App:
             self.is_recording = True
             try:
                 filename = f"recorded_data_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                self.recording_file = open(filename, "w")
+                self.recording_file = open(filename, "w", buffering=1 << 16)
                 self.record_button.config(text="Stop Rec")
             except Exception as e:
                 print(f"Error creating file: {e}")
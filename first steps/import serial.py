@@ -5,6 +5,10 @@ from tkinter import scrolledtext
 import serial
 import time
 import threading
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app via lib"))
 
 class SerialDeviceController:
     """Handles communication and sequence execution for the serial device."""
@@ -88,8 +92,13 @@ class SerialDeviceController:
             print(f"Unexpected error sending command '{command}': {e}")
             return False
 
-    def run_sequence(self, params, log_callback):
-        """Runs the main control sequence in a separate thread."""
+    def run_sequence(self, params, log_callback, on_step=None):
+        """Runs the main control sequence in a separate thread.
+
+        on_step(cycle, step, w17, w18) is called after every w17 step has
+        settled (step 0..N-1 ramp up, N..2N-1 ramp down); the ramp waits
+        for it, e.g. SynchronizedScan.count_step counts one SR400 period.
+        """
         if not self.is_connected():
             log_callback("Error: Cannot start sequence, not connected.")
             self.is_running = False
@@ -148,6 +157,8 @@ class SerialDeviceController:
                     w17_value = start_offset_w17 + offset_ramp
                     if not self.send_command(f":w17={w17_value}.", delay=inner_sleep):
                         raise Exception("Failed to send w17 command (ramp up)") # Stop if send fails
+                    if on_step is not None:
+                        on_step(cycle, n, w17_value, current_offset_w18)
                     # log_callback(f"  Set w17 = {w17_value}") # Too verbose for log
                     offset_ramp += 1
                 if self.stop_event.is_set(): break
@@ -167,6 +178,8 @@ class SerialDeviceController:
                     w17_value = (start_offset_w17 + inner_ramp_steps -1) - offset_ramp # Start from high value
                     if not self.send_command(f":w17={w17_value}.", delay=inner_sleep):
                         raise Exception("Failed to send w17 command (ramp down)")
+                    if on_step is not None:
+                        on_step(cycle, inner_ramp_steps + n, w17_value, current_offset_w18)
                     # log_callback(f"  Set w17 = {w17_value}") # Too verbose
                     offset_ramp += 1
                 if self.stop_event.is_set(): break
@@ -203,7 +216,7 @@ class SerialControlApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Serial Device Control")
-        self.root.geometry("650x550")
+        self.root.geometry("900x550")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         self.controller = SerialDeviceController()
@@ -300,6 +313,20 @@ class SerialControlApp:
         self.stop_button = ttk.Button(action_frame, text="Stop Sequence", command=self.stop_sequence, state=tk.DISABLED)
         self.stop_button.pack(side=tk.LEFT, padx=10, pady=5)
 
+        # Scan: one SR400 period counted at every w17 step
+        self.scan_button = ttk.Button(action_frame, text="Start Scan", command=self.start_scan, state=tk.DISABLED)
+        self.scan_button.pack(side=tk.LEFT, padx=10, pady=5)
+
+        ttk.Label(action_frame, text="SR400:").pack(side=tk.LEFT)
+        self.sr400_entry = ttk.Entry(action_frame, width=18)
+        self.sr400_entry.insert(0, "prologix:COM5:23")
+        self.sr400_entry.pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(action_frame, text="Tset (s):").pack(side=tk.LEFT)
+        self.tset_entry = ttk.Entry(action_frame, width=7)
+        self.tset_entry.insert(0, "0.01")
+        self.tset_entry.pack(side=tk.LEFT, padx=5)
+
         # Log Frame 
         self.log_area = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, height=15, width=70)
         self.log_area.pack(fill=tk.BOTH, expand=True)
@@ -324,6 +351,7 @@ class SerialControlApp:
             self.connect_button.config(state=tk.DISABLED)
             self.disconnect_button.config(state=tk.NORMAL)
             self.start_button.config(state=tk.NORMAL)
+            self.scan_button.config(state=tk.NORMAL)
             self.port_entry.config(state=tk.DISABLED)
             self.baud_entry.config(state=tk.DISABLED)
             self.log_message(f"Successfully connected to {port}.")
@@ -343,6 +371,7 @@ class SerialControlApp:
         self.connect_button.config(state=tk.NORMAL)
         self.disconnect_button.config(state=tk.DISABLED)
         self.start_button.config(state=tk.DISABLED)
+        self.scan_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.DISABLED)
         self.port_entry.config(state=tk.NORMAL)
         self.baud_entry.config(state=tk.NORMAL)
@@ -379,20 +408,64 @@ class SerialControlApp:
         if params is None:
             return # Error message already logged by get_params
 
+        # Pass the log_message method as the callback
+        self.run_in_thread(self.controller.run_sequence, (params, self.log_message))
+
+    def run_in_thread(self, target, args):
+        """Starts target in the sequence thread with Start/Scan disabled until it ends."""
         # Disable Start, enable Stop
         self.start_button.config(state=tk.DISABLED)
+        self.scan_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
         self.set_param_entries_state(tk.DISABLED) # Disable editing during run
 
-        # Pass the log_message method as the callback
         self.sequence_thread = threading.Thread(
-            target=self.controller.run_sequence,
-            args=(params, self.log_message),
+            target=target,
+            args=args,
             daemon=True # Allows app to exit even if thread is stuck
         )
         self.sequence_thread.start()
         self.check_sequence_thread() # Start checking if thread finished
 
+    def start_scan(self):
+        """Runs the sequence with one SR400 period counted at every w17 step."""
+        if not self.controller.is_connected():
+            self.log_message("Error: Not connected.")
+            return
+        if self.controller.is_running:
+            self.log_message("Sequence already running.")
+            return
+        params = self.get_params()
+        if params is None:
+            return
+        try:
+            tset = float(self.tset_entry.get())
+        except ValueError as e:
+            self.log_message(f"Invalid Tset: {e}")
+            return
+        self.run_in_thread(self.run_scan, (params, self.sr400_entry.get(), tset))
+
+    def run_scan(self, params, resource, tset):
+        """Scan thread: opens the SR400, runs the synchronized scan and saves the map."""
+        from sr400_device import SR400Device
+        from sync_scan import SynchronizedScan
+        try:
+            device = SR400Device(resource)
+        except Exception as e:
+            self.log_message(f"Error opening SR400 {resource}: {e}")
+            return
+        device.tset = tset
+        scan = SynchronizedScan(device, params['num_cycles'], params.get('inner_ramp_steps', 100))
+        try:
+            scan_map = scan.run(self.controller, params, self.log_message)
+        finally:
+            device.close()
+        name = f"scan_{time.strftime('%Y%m%d_%H%M%S')}"
+        scan_map.save(f"{name}.csv")
+        scan_map.save_matrix(f"{name}_A.csv", "A")
+        scan_map.save_matrix(f"{name}_B.csv", "B")
+        self.log_message(f"Scan: {scan_map.filled} steps counted, saved to {name}.csv ({name}_A.csv, {name}_B.csv: step x cycle)")
+
     def stop_sequence(self):
         """Handles the Stop Sequence button click."""
         self.log_message("Stop button pressed.")
@@ -408,6 +481,7 @@ class SerialControlApp:
             # Finished or wasn't running
             if self.controller.is_connected(): # Only enable if still connected
                 self.start_button.config(state=tk.NORMAL)
+                self.scan_button.config(state=tk.NORMAL)
                 self.set_param_entries_state(tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
             # Log if it finished unexpectedly (e.g., error) vs normal stop?
@@ -421,6 +495,8 @@ class SerialControlApp:
         self.start_offset_w18_entry.config(state=state)
         self.num_cycles_entry.config(state=state)
         self.inner_sleep_entry.config(state=state)
+        self.sr400_entry.config(state=state)
+        self.tset_entry.config(state=state)
 
 
     def on_closing(self):